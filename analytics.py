@@ -0,0 +1,88 @@
+"""Streaks and activity trends for the Achievements tab.
+
+Everything is computed with pandas/NumPy from the per-day counts the
+storage layer keeps in each user's summary, so the cost depends on the
+number of active days, not on the number of entries.  Results are cached
+per user against the summary's revision, charged to the storage layer's
+memory budget.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage.cache import UserDataCache
+
+# Charts never get more points than this; longer histories are resampled
+# to weekly or monthly totals first.
+MAX_POINTS = 180
+TYPES = ['goals', 'reflections', 'mistakes', 'challenges']
+
+_cache = UserDataCache(name="analytics")
+
+
+def daily_counts(summary):
+    """DataFrame of entry counts per day (rows) and type (columns)."""
+    per_day = summary.get('per_day', {})
+    if not per_day:
+        return pd.DataFrame(columns=TYPES, index=pd.DatetimeIndex([]), dtype="int64")
+    frame = pd.DataFrame.from_dict(per_day, orient='index').reindex(columns=TYPES)
+    frame = frame.fillna(0).astype("int64")
+    frame.index = pd.to_datetime(frame.index)
+    return frame.sort_index()
+
+
+def streaks(days, today=None):
+    """``(current, longest)`` runs of consecutive days in a sorted DatetimeIndex.
+
+    The current streak still counts if the last active day was yesterday.
+    """
+    if len(days) == 0:
+        return 0, 0
+    ordinals = days.values.astype("datetime64[D]").astype("int64")
+    breaks = np.diff(ordinals) != 1
+    run_ids = np.concatenate(([0], np.cumsum(breaks)))
+    run_lengths = np.bincount(run_ids)
+    today = (today or date.today()).toordinal() - date(1970, 1, 1).toordinal()
+    current = int(run_lengths[-1]) if ordinals[-1] >= today - 1 else 0
+    return current, int(run_lengths.max())
+
+
+def downsample(frame, max_points=MAX_POINTS):
+    """Resample to the finest of day/week/month that fits ``max_points``."""
+    if frame.empty:
+        return frame, "D"
+    span_days = (frame.index[-1] - frame.index[0]).days + 1
+    for freq, days_per_point in (("D", 1), ("W", 7), ("MS", 30)):
+        if span_days / days_per_point <= max_points or freq == "MS":
+            return frame.resample(freq).sum(), freq
+
+
+def compute(summary, today=None):
+    frame = daily_counts(summary)
+    current, longest = streaks(frame.index[frame['reflections'] > 0], today)
+    active_current, active_longest = streaks(frame.index[frame.sum(axis=1) > 0], today)
+    goals = summary['counts'].get('goals', 0)
+    trend, freq = downsample(frame)
+    recent = frame[frame.index >= pd.Timestamp((today or date.today()) - timedelta(days=29))]
+    return {
+        'reflection_streak': current,
+        'longest_reflection_streak': longest,
+        'active_streak': active_current,
+        'longest_active_streak': active_longest,
+        'completion_rate': summary['completed_goals'] / goals if goals else 0.0,
+        'active_days_30': int((recent.sum(axis=1) > 0).sum()),
+        'trend': trend,
+        'trend_freq': freq,
+        'weekly': frame.resample("W").sum(),
+        'monthly': frame.resample("MS").sum(),
+    }
+
+
+def user_analytics(username, summary):
+    """Analytics for ``summary``, reused while its revision is unchanged."""
+    version = (summary.get('revision'), date.today())
+    result = _cache.get(username, version)
+    if result is None:
+        result = _cache.put(username, version, compute(summary))
+    return result
@@ -0,0 +1,42 @@
+"""Login throughput: concurrent password checks through the storage facade."""
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD = "benchmark-password"
+
+
+def bench_logins(backend, n_users=20, n_logins=200, sessions=16):
+    """Logins per second with ``sessions`` concurrent users logging in.
+
+    Half the accounts are created through sign-up (hashed) and half are
+    saved in plaintext the old way; the first login of each of those
+    upgrades it, as in production.
+    """
+    import storage
+
+    storage.use_backend(backend)
+    usernames = [f"login-{i}" for i in range(n_users)]
+    for i, username in enumerate(usernames):
+        if i % 2:
+            storage.create_account(username, f"{username}@example.com", PASSWORD)
+        else:
+            backend.save_account({'username': username, 'email': f"{username}@example.com",
+                                  'password': PASSWORD})
+    # A fresh index, so the first lookup pays for loading it
+    storage.use_backend(backend)
+
+    def login(username):
+        start = time.perf_counter()
+        if not storage.verify_login(username, PASSWORD):
+            raise RuntimeError(f"login failed for {username}")
+        return time.perf_counter() - start
+
+    picks = [random.choice(usernames) for _ in range(n_logins)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        samples = list(pool.map(login, picks))
+    elapsed = time.perf_counter() - start
+    return {'logins_per_s': n_logins / elapsed,
+            'verify_login_s': statistics.median(samples)}
@@ -0,0 +1,46 @@
+"""Per-rerun render time of the login page and dashboard via AppTest."""
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECTIONS = ("🎯 Goals", "📝 Daily Reflection", "🔍 Mistake Tracker", "💪 Challenges",
+            "🏆 Achievements")
+
+
+def _timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed
+
+
+def bench_login(username, password='benchmark', repeats=3):
+    samples = []
+    for _ in range(repeats):
+        at = AppTest.from_file(os.path.join(REPO, "main.py"), default_timeout=120)
+        at.run()
+        at.text_input(key="login_username").input(username)
+        at.text_input(key="login_password").input(password)
+        at.button[1].click()
+        samples.append(_timed_run(at))
+    return statistics.median(samples)
+
+
+def bench_dashboard(username, repeats=3):
+    """Median rerun time per dashboard section, keyed ``render_<section>_s``."""
+    at = AppTest.from_file(os.path.join(REPO, "pages", "app.py"), default_timeout=120)
+    at.session_state['logged_in'] = True
+    at.session_state['username'] = username
+    _timed_run(at)
+    result = {}
+    for section in SECTIONS:
+        at.session_state['section'] = section
+        samples = [_timed_run(at) for _ in range(repeats)]
+        name = section.split(" ", 1)[1].lower().replace(" ", "_")
+        result[f'render_{name}_s'] = statistics.median(samples)
+    return result
@@ -0,0 +1,122 @@
+"""Storage and page-render benchmarks over synthetic users.
+
+Usage::
+
+    python -m benchmarks.run [--sizes 10,1000,100000] [--backends files,sqlite]
+                             [--render] [--logins] [--save PATH] [--baseline PATH]
+
+Results are written as JSON (``benchmarks/results/latest.json`` by default).
+With ``--baseline`` every metric is compared against an earlier run and the
+command exits non-zero if any got slower than ``--threshold`` times.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _make_backend(name, workdir):
+    if name == "files":
+        from storage.files import FileBackend
+        return FileBackend()
+    if name == "sqlite":
+        from storage.sqlite import SqliteBackend
+        return SqliteBackend(os.path.join(workdir, "bench.db"))
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def run(sizes, backends, render, repeats, logins=False):
+    # Point the storage layer at a scratch users/ tree before it is imported.
+    workdir = tempfile.mkdtemp(prefix="growth-bench-")
+    os.environ["GROWTH_USERS_DIR"] = os.path.join(workdir, "users")
+    from benchmarks.storage_bench import bench_storage
+
+    results = []
+    for backend_name in backends:
+        backend = _make_backend(backend_name, workdir)
+        for n_entries in sizes:
+            row = {'backend': backend_name, 'entries': n_entries}
+            row.update(bench_storage(backend, n_entries, repeats))
+            if render:
+                from benchmarks.render_bench import bench_dashboard, bench_login
+                username = f"bench-{n_entries}"
+                row['login_s'] = bench_login(username)
+                row.update(bench_dashboard(username))
+            results.append(row)
+            print(_format_row(row), flush=True)
+        if logins:
+            from benchmarks.login_bench import bench_logins
+            row = {'backend': backend_name, 'entries': 0}
+            row.update(bench_logins(backend))
+            results.append(row)
+            print(_format_row(row), flush=True)
+    return results
+
+
+def _format_row(row):
+    metrics = ", ".join(
+        f"{k}={v / 1024 / 1024:.1f}MB" if k.endswith('_bytes')
+        else f"{k}={v:.1f}" if k.endswith('_per_s')
+        else f"{k}={v * 1000:.2f}ms"
+        for k, v in row.items() if k not in ('backend', 'entries'))
+    return f"{row['backend']:7s} {row['entries']:>9,d}  {metrics}"
+
+
+def compare(results, baseline, threshold):
+    """Return descriptions of metrics that regressed against ``baseline``."""
+    previous = {(r['backend'], r['entries']): r for r in baseline['results']}
+    regressions = []
+    for row in results:
+        old = previous.get((row['backend'], row['entries']))
+        if old is None:
+            continue
+        for metric, value in row.items():
+            if metric.endswith('_s') and metric in old and value > old[metric] * threshold:
+                regressions.append(
+                    f"{row['backend']} {row['entries']:,d} {metric}: "
+                    f"{old[metric] * 1000:.2f}ms -> {value * 1000:.2f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,100000",
+                        help="comma-separated entry counts (up to 1000000)")
+    parser.add_argument("--backends", default="files,sqlite")
+    parser.add_argument("--render", action="store_true",
+                        help="also time main.py login and pages/app.py reruns")
+    parser.add_argument("--logins", action="store_true",
+                        help="also measure concurrent logins per second")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown factor that counts as a regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(sizes, args.backends.split(","), args.render, args.repeats, args.logins)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+    with open(args.save, "w") as f:
+        json.dump({'meta': {'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                            'python': platform.python_version(),
+                            'machine': platform.platform()},
+                   'results': results}, f, indent=2)
+    print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
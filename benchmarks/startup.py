@@ -0,0 +1,77 @@
+"""Time-to-first-render for the login page and the dashboard.
+
+Usage::
+
+    python -m benchmarks.startup [--login-budget 1.0] [--dashboard-budget 1.5]
+
+Each page is rendered once with Streamlit's AppTest in a fresh Python
+process, so the numbers include every import the page pulls in.  Exits
+non-zero if a page is over its budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints one JSON line with its timings.
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+sys.path.insert(0, {repo!r})
+at = AppTest.from_file({script!r}, default_timeout=60)
+if {logged_in!r}:
+    at.session_state['logged_in'] = True
+    at.session_state['username'] = {username!r}
+at.run()
+t2 = time.perf_counter()
+if at.exception:
+    raise SystemExit(f"page raised: {{at.exception[0].message}}")
+print(json.dumps({{'streamlit_import': t1 - t0, 'first_render': t2 - t1}}))
+"""
+
+
+def measure(script, logged_in=False, username="bench"):
+    """Render ``script`` once in a clean interpreter and return its timings."""
+    with tempfile.TemporaryDirectory() as workdir:
+        users = os.path.join(workdir, "users")
+        os.makedirs(users)
+        with open(os.path.join(users, f"{username}.json"), "w") as f:
+            json.dump({'username': username, 'email': 'bench@example.com',
+                       'password': 'benchmark'}, f)
+        code = _PROBE.format(repo=REPO, script=os.path.join(REPO, script),
+                             logged_in=logged_in, username=username)
+        env = {**os.environ, "GROWTH_USERS_DIR": users}
+        out = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                             capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--login-budget", type=float, default=1.0,
+                        help="seconds allowed for the first render of main.py")
+    parser.add_argument("--dashboard-budget", type=float, default=1.5,
+                        help="seconds allowed for the first render of pages/app.py")
+    args = parser.parse_args()
+
+    pages = [("login", "main.py", False, args.login_budget),
+             ("dashboard", "pages/app.py", True, args.dashboard_budget)]
+    over = False
+    for name, script, logged_in, budget in pages:
+        timings = measure(script, logged_in)
+        ok = timings['first_render'] <= budget
+        over |= not ok
+        print(f"{name:10s} first render {timings['first_render'] * 1000:7.1f} ms "
+              f"(budget {budget * 1000:.0f} ms, streamlit import "
+              f"{timings['streamlit_import'] * 1000:.0f} ms) {'ok' if ok else 'OVER BUDGET'}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Save/load latency and memory of the storage layer."""
+import statistics
+import time
+import tracemalloc
+
+import storage
+from benchmarks.synth import create_user
+
+
+def _median_seconds(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def bench_storage(backend, n_entries, repeats=5):
+    """Metrics for one backend holding a user with ``n_entries`` entries."""
+    username = f"bench-{n_entries}"
+    create_user(backend, username, n_entries)
+    storage.use_backend(backend)
+
+    def cold_load():
+        storage._cache.clear()
+        storage.load_user_data(username)
+
+    result = {
+        'load_cold_s': _median_seconds(cold_load, repeats),
+        'load_warm_s': _median_seconds(lambda: storage.load_user_data(username), repeats),
+        'page_s': _median_seconds(
+            lambda: storage.load_entries_page(username, 'reflections'), repeats),
+        'summary_s': _median_seconds(lambda: storage.get_summary(username), repeats),
+        'save_s': _median_seconds(lambda: storage.save_user_data(
+            username, 'reflections', {'reflection': 'benchmark', 'challenges': '',
+                                      'solutions': ''}), repeats),
+    }
+    # A load right after a save pays for the invalidated cache.
+    result['load_after_save_s'] = _median_seconds(
+        lambda: (storage.save_user_data(username, 'mistakes', {'mistake': 'm', 'learning': 'l'}),
+                 storage.load_user_data(username)), repeats)
+
+    storage._cache.clear()
+    tracemalloc.start()
+    storage.load_user_data(username)
+    result['load_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result['cache_bytes'] = storage._cache.size
+    return result
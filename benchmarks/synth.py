@@ -0,0 +1,62 @@
+"""Synthetic users for benchmarks."""
+import random
+from datetime import datetime, timedelta
+
+from storage.entries import new_entry_id
+from storage.summary import build_summary
+
+# Rough mix of entry types seen in real journals.
+MIX = (("reflections", 0.4), ("goals", 0.2), ("mistakes", 0.2), ("challenges", 0.2))
+WORDS = ("learn", "practice", "python", "growth", "mindset", "focus", "debug", "read",
+         "write", "mistake", "progress", "habit", "test", "refactor", "teach", "plan")
+CHALLENGES = (
+    "Learn a new programming concept today",
+    "Read an article about Growth Mindset",
+    "Help someone else learn something new",
+    "Practice problem-solving for 30 minutes",
+    "Write code documentation for better understanding",
+)
+
+
+def _text(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_entry(rng, data_type, timestamp):
+    if data_type == "goals":
+        entry = {'goal': _text(rng, 4),
+                 'status': rng.choice(('In Progress', 'Completed'))}
+    elif data_type == "reflections":
+        entry = {'reflection': _text(rng, 30), 'challenges': _text(rng), 'solutions': _text(rng)}
+    elif data_type == "mistakes":
+        entry = {'mistake': _text(rng), 'learning': _text(rng)}
+    else:
+        entry = {'challenge': rng.choice(CHALLENGES), 'notes': _text(rng)}
+    entry['timestamp'] = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    entry['id'] = new_entry_id()
+    return entry
+
+
+def make_user_data(n_entries, seed=0, days=3 * 365):
+    """``n_entries`` entries spread over ``days`` days, in time order."""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    step = timedelta(days=days) / max(n_entries, 1)
+    types = [data_type for data_type, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    user_data = {data_type: [] for data_type in ("goals", "reflections", "mistakes",
+                                                  "challenges", "achievements")}
+    for i in range(n_entries):
+        data_type = rng.choices(types, weights)[0]
+        user_data[data_type].append(make_entry(rng, data_type, start + step * i))
+    return user_data
+
+
+def create_user(backend, username, n_entries, seed=0):
+    """Write an account plus ``n_entries`` entries in one bulk write."""
+    backend.save_account({'username': username, 'email': f"{username}@example.com",
+                          'password': 'benchmark'})
+    user_data = make_user_data(n_entries, seed)
+    backend.replace_user_data(username, user_data)
+    backend.save_aux(username, 'summary', build_summary(user_data))
+    return user_data
@@ -1,3 +1,13 @@
+import streamlit as st
+
+import metrics
+from storage import create_account, verify_login
+from storage.fileio import CorruptDataError
+
+DAMAGED_DATA = ("Account data can't be read because a data file is damaged and needs "
+                "repair. Please contact the administrator.")
+
+
 def main():
 # # Imports
 # import streamlit as st
@@ -36,37 +46,18 @@ def main():
 #         st.dataframe(df.head())
 
 
-    import streamlit as st
-    import json
-    import os
-
     st.set_page_config(
         page_title="Growth Mind Set",
         page_icon = ":cd:",
         layout = "centered"
     )
 
-    def load_user_data(username):
-        try:
-            with open(f'users/{username}.json', 'r') as f:
-                return json.load(f)
-        except:
-            return None
+    metrics.start_exporters()
+    metrics.begin_rerun()
 
     # Add tabs for Sign Up and Login
     tab1, tab2 = st.tabs(["Sign Up", "Login"])
 
-    def save_user_data(username, email, password):
-        user_data = {
-            'username': username,
-            'email': email,
-            'password': password
-        }
-        if not os.path.exists('users'):
-            os.makedirs('users')
-        with open(f'users/{username}.json', 'w') as f:
-            json.dump(user_data, f)
-
     with tab1:
         st.title("Sign Up To Growth Mind")
         name = st.text_input("Enter username : ", key="signup_name")
@@ -78,11 +69,19 @@ def main():
                 if "@" in email and "." in email:
                     if len(password) >= 6:
                         # Save user data
-                        save_user_data(name, email, password)
-                        st.success("Account created successfully!")
-                        st.session_state['logged_in'] = True
-                        st.session_state['username'] = name
-                        st.switch_page("pages/app.py")
+                        try:
+                            with metrics.timed("signup"):
+                                created = create_account(name, email, password)
+                        except CorruptDataError:
+                            created = None
+                            st.error(DAMAGED_DATA)
+                        if created:
+                            st.success("Account created successfully!")
+                            st.session_state['logged_in'] = True
+                            st.session_state['username'] = name
+                            st.switch_page("pages/app.py")
+                        elif created is not None:
+                            st.error("That username is already taken")
                     else:
                         st.error("Password must be at least 6 characters long")
                 else:
@@ -97,17 +96,24 @@ def main():
         
         if st.button("Login"):
             if login_username and login_password:
-                user_data = load_user_data(login_username)
-                if user_data and user_data['password'] == login_password:
+                try:
+                    with metrics.timed("login"), st.spinner("Checking your password..."):
+                        valid = verify_login(login_username, login_password)
+                except CorruptDataError:
+                    valid = None
+                    st.error(DAMAGED_DATA)
+                if valid:
                     st.success("Login successful!")
                     st.session_state['logged_in'] = True
                     st.session_state['username'] = login_username
                     st.switch_page("pages/app.py")
-                else:
+                elif valid is not None:
                     st.error("Invalid username or password")
             else:
                 st.error("Please enter both username and password")
 
+    metrics.render_debug_panel(st)
+
         
         
 
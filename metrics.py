@@ -0,0 +1,206 @@
+"""Timing instrumentation for storage calls and page rendering.
+
+Wrap hot paths with :func:`timed`; every call is recorded in
+
+* Prometheus-style counters and histograms (``growth_operation_seconds``),
+  written to ``GROWTH_METRICS_FILE`` and/or served on ``GROWTH_METRICS_PORT``,
+* a JSON log line per call on the ``growth.metrics`` logger, sent to
+  ``GROWTH_METRICS_LOG`` when set,
+* the current rerun's breakdown, shown by :func:`render_debug_panel`.
+
+Fragment reruns only run the fragment, so dashboard sections collect and
+show their own breakdown with :func:`profiled_fragment`.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+EXPORT_INTERVAL = float(os.environ.get("GROWTH_METRICS_INTERVAL", "15"))
+
+logger = logging.getLogger("growth.metrics")
+
+_lock = threading.Lock()
+_counts = {}
+_errors = {}
+_sums = {}
+_buckets = {}
+_rerun = threading.local()
+_exporters_started = False
+
+
+def record(op, seconds, error=False):
+    with _lock:
+        _counts[op] = _counts.get(op, 0) + 1
+        _sums[op] = _sums.get(op, 0.0) + seconds
+        if error:
+            _errors[op] = _errors.get(op, 0) + 1
+        buckets = _buckets.setdefault(op, [0] * len(BUCKETS))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+    timings = getattr(_rerun, "timings", None)
+    if timings is not None:
+        timings.append((op, seconds))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'op': op, 'seconds': round(seconds, 6), 'error': error,
+                                'ts': time.time()}))
+
+
+@contextmanager
+def timed(op):
+    """Time the enclosed block as operation ``op``."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(op, time.perf_counter() - start, error)
+
+
+def timed_call(op):
+    """Decorator form of :func:`timed`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(op):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin_rerun():
+    """Start collecting a breakdown for the script run on this thread."""
+    _rerun.timings = []
+
+
+def end_rerun():
+    _rerun.timings = None
+
+
+def rerun_timings():
+    return list(getattr(_rerun, "timings", None) or [])
+
+
+def profiled_fragment(st):
+    """Decorator for a function under ``@st.fragment``: shows the rerun
+    breakdown at its end.
+
+    On a full run it includes what the script timed before the fragment;
+    on a fragment rerun, where nothing else runs, it covers the fragment.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_rerun, "timings", None) is None:
+                begin_rerun()
+            try:
+                result = fn(*args, **kwargs)
+                render_debug_panel(st)
+                return result
+            finally:
+                end_rerun()
+        return wrapper
+    return decorate
+
+
+def prometheus_text():
+    """Current metrics in the Prometheus text exposition format."""
+    lines = ["# TYPE growth_operation_seconds histogram"]
+    with _lock:
+        for op in sorted(_counts):
+            for bound, count in zip(BUCKETS, _cumulative(_buckets[op])):
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'growth_operation_seconds_bucket{{op="{op}",le="{le}"}} {count}')
+            lines.append(f'growth_operation_seconds_sum{{op="{op}"}} {_sums[op]}')
+            lines.append(f'growth_operation_seconds_count{{op="{op}"}} {_counts[op]}')
+        lines.append("# TYPE growth_operation_errors_total counter")
+        for op in sorted(_errors):
+            lines.append(f'growth_operation_errors_total{{op="{op}"}} {_errors[op]}')
+    return "\n".join(lines) + "\n"
+
+
+def _cumulative(counts):
+    total = 0
+    for count in counts:
+        total += count
+        yield total
+
+
+def _write_metrics_file(path):
+    while True:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+        time.sleep(EXPORT_INTERVAL)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporters():
+    """Start the configured exporters once per process."""
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    log_path = os.environ.get("GROWTH_METRICS_LOG")
+    if log_path:
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    metrics_file = os.environ.get("GROWTH_METRICS_FILE")
+    if metrics_file:
+        threading.Thread(target=_write_metrics_file, args=(metrics_file,), daemon=True).start()
+    port = os.environ.get("GROWTH_METRICS_PORT")
+    if port:
+        server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def debug_panel_enabled(st):
+    return (os.environ.get("GROWTH_DEBUG_PANEL") == "1"
+            or st.query_params.get("debug") == "1")
+
+
+def render_debug_panel(st):
+    """Show this rerun's timings when the panel is enabled (``?debug=1``)."""
+    if not debug_panel_enabled(st):
+        return
+    timings = rerun_timings()
+    with st.expander("⏱️ Rerun profile"):
+        if not timings:
+            st.write("No timed operations in this rerun.")
+            return
+        totals = {}
+        for op, seconds in timings:
+            calls, total = totals.get(op, (0, 0.0))
+            totals[op] = (calls + 1, total + seconds)
+        st.table([{'operation': op, 'calls': calls, 'total ms': round(total * 1000, 2)}
+                  for op, (calls, total) in sorted(totals.items(), key=lambda item: -item[1][1])])
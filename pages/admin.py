@@ -0,0 +1,97 @@
+import os
+
+import streamlit as st
+
+import metrics
+from storage import memory_report
+from storage.rollups import load_rollups
+
+# Comma-separated usernames allowed to see this page
+ADMINS = {name.strip() for name in os.environ.get("GROWTH_ADMINS", "").split(",") if name.strip()}
+
+st.set_page_config(
+    page_title="Growth Mind Set - Admin",
+    page_icon=":bar_chart:",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+metrics.start_exporters()
+metrics.begin_rerun()
+
+username = st.session_state.get('username')
+if not st.session_state.get('logged_in') or username not in ADMINS:
+    st.error("This page is only available to administrators.")
+    st.stop()
+
+st.title("📊 Community Overview")
+
+# Materialized by `python -m storage.rollups`; reading it is the only work
+with metrics.timed("render.admin"):
+    rollups = load_rollups()
+
+if rollups is None:
+    st.info("No rollups yet. Run `python -m storage.rollups` to generate them.")
+    st.stop()
+
+st.caption(f"Generated {rollups['generated_at']} from {rollups['users']} users"
+           + (f" in {rollups['seconds']}s" if 'seconds' in rollups else ""))
+
+active = rollups['active_users']
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Users", rollups['users'])
+col2.metric("Active today", active['1'])
+col3.metric("Active this week", active['7'])
+col4.metric("Active this month", active['30'])
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Entries", sum(rollups['entries'].values()))
+col2.metric("Goals completed", rollups['completed_goals'])
+col3.metric("Goal completion rate", f"{rollups['completion_rate']:.0%}")
+
+if rollups['per_day']:
+    import pandas as pd
+
+    per_day = pd.DataFrame.from_dict(rollups['per_day'], orient='index').fillna(0)
+    per_day.index = pd.to_datetime(per_day.index)
+    st.subheader("Entries per day")
+    st.bar_chart(per_day)
+
+    daily_active = pd.Series(rollups['daily_active_users'], name="users")
+    daily_active.index = pd.to_datetime(daily_active.index)
+    st.subheader("Daily active users")
+    st.line_chart(daily_active)
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.subheader("🏅 Top challenges")
+    st.dataframe([{"Challenge": name, "Completions": count}
+                  for name, count in rollups['top_challenges']],
+                 hide_index=True, use_container_width=True)
+with col2:
+    st.subheader("🔥 Most active (30 days)")
+    st.dataframe([{"User": name, "Active days": score}
+                  for name, score in rollups['leaderboards']['active_days_30']],
+                 hide_index=True, use_container_width=True)
+with col3:
+    st.subheader("🎯 Most goals completed")
+    st.dataframe([{"User": name, "Goals": score}
+                  for name, score in rollups['leaderboards']['completed_goals']],
+                 hide_index=True, use_container_width=True)
+
+# Unlike the rollups this is live, and only for the process serving this page.
+with st.expander("🧠 Memory (this server process)"):
+    memory = memory_report()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Budget", f"{memory['max_bytes'] / 2 ** 20:.0f} MB")
+    col2.metric("In use", f"{memory['used_bytes'] / 2 ** 20:.1f} MB")
+    col3.metric("Evictions", memory['evictions'])
+    st.dataframe([{"Cache": cache['name'], "Items": cache['items'],
+                   "MB": round(cache['bytes'] / 2 ** 20, 2),
+                   "Evicted but in use": cache.get('evicted_in_use', 0),
+                   "Hit rate": (f"{cache['hits'] / (cache['hits'] + cache['misses']):.0%}"
+                                if cache.get('hits', 0) + cache.get('misses', 0) else "")}
+                  for cache in memory['caches']],
+                 hide_index=True, use_container_width=True)
+
+metrics.render_debug_panel(st)
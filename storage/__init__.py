@@ -0,0 +1,399 @@
+"""Storage for Growth Mind Set accounts and entries.
+
+Both pages go through the functions here rather than touching ``users/``
+directly.  The backend is picked once per process from ``GROWTH_STORAGE``
+(``files``, the default, ``sqlite``, or ``remote`` for a server shared by
+several replicas, see :mod:`storage.remote`) and shared by every session.  With
+``GROWTH_DURABILITY`` set to ``batched`` or ``async`` it is wrapped in the
+write-behind queue from :mod:`storage.writebehind`.
+
+Loaded data is shared between sessions as read-only snapshots, and every
+cache here, like the archive's and the analytics', counts against one
+per-process memory budget (see :mod:`storage.cache`; :func:`memory_report`
+shows how it is spent).
+
+The JSON backend archives old reflections and mistakes (see
+:mod:`storage.archive`): :func:`load_user_data` returns recent entries and
+:func:`load_history` everything, which paging falls back to once the
+recent entries run out.
+"""
+import os
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from metrics import timed_call
+from storage import accounts as passwords
+from storage import summary as summaries
+from storage.cache import BUDGET, UserDataCache
+from storage.entries import new_entry_id
+from storage.journal import DATA_TYPES
+from storage.paging import PAGE_SIZE, StatusIndex, page_list
+from storage.search import IndexRegistry, build_index
+
+_backend = None
+_accounts = None
+_budget = BUDGET
+_cache = UserDataCache(_budget, "user data")
+_history_cache = UserDataCache(_budget, "history")
+_search_indexes = IndexRegistry(budget=_budget, name="search indexes")
+_status_indexes = IndexRegistry(budget=_budget, name="status indexes")
+_backend_lock = threading.Lock()
+# Search indexes are built here, at most one build per user at a time.
+_index_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-index")
+_index_builds = {}
+_index_builds_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend, _accounts
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = _create_backend(os.environ.get("GROWTH_STORAGE", "files"))
+                durability = os.environ.get("GROWTH_DURABILITY", "sync")
+                if durability != "sync":
+                    from storage.writebehind import WriteBehindBackend
+                    backend = WriteBehindBackend(backend, durability)
+                _accounts = passwords.AccountIndex(backend)
+                _backend = backend
+    return _backend
+
+
+def use_backend(backend):
+    """Swap in a specific backend instance (tools and benchmarks)."""
+    global _backend, _accounts
+    with _backend_lock:
+        _accounts = passwords.AccountIndex(backend)
+        _backend = backend
+    _cache.clear()
+    _history_cache.clear()
+    _search_indexes.clear()
+    _status_indexes.clear()
+
+
+def _account_index():
+    get_backend()
+    return _accounts
+
+
+def _create_backend(name):
+    if name == "files":
+        from storage.files import FileBackend
+        return FileBackend()
+    if name == "sqlite":
+        from storage.sqlite import SqliteBackend
+        return SqliteBackend()
+    if name == "remote":
+        from storage.remote import RemoteBackend
+        return RemoteBackend()
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+@timed_call("storage.flush")
+def flush(username=None):
+    """Write out anything still queued for ``username`` (or everyone)."""
+    get_backend().flush(username)
+
+
+@timed_call("storage.prefetch")
+def prefetch(username):
+    """Fetch what every rerun checks for the user in one go (remote backend)."""
+    get_backend().prefetch(username)
+
+
+@timed_call("storage.get_account")
+def get_account(username):
+    return _account_index().get(username)
+
+
+@timed_call("storage.create_account")
+def create_account(username, email, password):
+    """Sign up a new user; returns False if the username is already taken."""
+    return _account_index().create({
+        'username': username,
+        'email': email,
+        'password': passwords.in_pool(passwords.hash_password, password)
+    })
+
+
+@timed_call("storage.save_account")
+def save_account(username, email, password):
+    """Create or overwrite an account (tools); sign-ups use create_account."""
+    _account_index().save({
+        'username': username,
+        'email': email,
+        'password': passwords.in_pool(passwords.hash_password, password)
+    })
+
+
+@timed_call("storage.verify_login")
+def verify_login(username, password):
+    """True if the password matches; upgrades legacy plaintext passwords."""
+    index = _account_index()
+    account = index.get(username)
+    if account is None:
+        passwords.in_pool(passwords.dummy_check, password)
+        return False
+    if not passwords.in_pool(passwords.verify_password, password, account['password']):
+        return False
+    if not passwords.is_hashed(account['password']):
+        index.save({**account,
+                    'password': passwords.in_pool(passwords.hash_password, password)})
+    return True
+
+
+@timed_call("storage.account_exists")
+def account_exists(username):
+    return _account_index().get(username) is not None
+
+
+@timed_call("storage.save_user_data")
+def save_user_data(username, data_type, content):
+    """Add a new entry and return its ID."""
+    # Add timestamp and a stable ID to content
+    content['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    content.setdefault('id', new_entry_id())
+    # The summary must exist before the write, otherwise building it could
+    # count this entry and then have the delta applied on top.
+    get_summary(username)
+    get_backend().add_entry(username, data_type, content)
+    _invalidate(username)
+    _update_summary(username, summaries.apply_add, data_type, content)
+    _update_index(username, lambda index: index.add(data_type, content))
+    return content['id']
+
+
+@timed_call("storage.add_entries")
+def add_entries(username, data_type, entries):
+    """Bulk-add entries (imports); keeps existing ids and timestamps."""
+    get_summary(username)
+    for entry in entries:
+        entry.setdefault('timestamp', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        entry.setdefault('id', new_entry_id())
+    get_backend().add_entries(username, data_type, entries)
+    _invalidate(username)
+    with get_backend().lock(username, 'summary'):
+        summary = get_backend().load_aux(username, 'summary')
+        for entry in entries:
+            summaries.apply_add(summary, data_type, entry)
+        get_backend().save_aux(username, 'summary', summary)
+    _update_index(username, lambda index: [index.add(data_type, entry) for entry in entries])
+
+
+@timed_call("storage.update_entry")
+def update_entry(username, data_type, entry_id, changes):
+    """Change fields of a single entry in place, e.g. a goal's status."""
+    get_summary(username)
+    old = _find_entry(username, data_type, entry_id)
+    get_backend().update_entry(username, data_type, entry_id, changes)
+    _invalidate(username)
+    if old is not None:
+        new = {**old, **changes}
+        _update_summary(username, summaries.apply_update, data_type, old, new)
+        _update_index(username, lambda index: index.add(data_type, new))
+
+
+@timed_call("storage.delete_entry")
+def delete_entry(username, data_type, entry_id):
+    get_summary(username)
+    old = _find_entry(username, data_type, entry_id)
+    get_backend().delete_entry(username, data_type, entry_id)
+    _invalidate(username)
+    if old is not None:
+        _update_summary(username, summaries.apply_delete, data_type, old)
+    _update_index(username, lambda index: index.remove(data_type, entry_id))
+
+
+@timed_call("storage.load_entries_page")
+def load_entries_page(username, data_type, limit=PAGE_SIZE, before=None, since=None,
+                      until=None, status=None):
+    """One page of entries, newest first, plus a cursor for the next page.
+
+    Pass the returned cursor as ``before`` to get older entries; it is None
+    when there are no more.  ``since``/``until`` restrict to a date range
+    and ``status`` to goals with that status.
+    """
+    backend = get_backend()
+    if backend.indexed_paging:
+        return backend.page(username, data_type, limit, before, since, until, status)
+    if status is not None:
+        entries = _status_index(username, data_type).groups.get(status, [])
+        return page_list(entries, limit, before, since, until)
+    if before is not None and before.startswith(_ARCHIVED):
+        return _history_page(username, data_type, limit, int(before[1:]), since, until)
+    entries = load_user_data(username, data_type)
+    page, cursor = page_list(entries, limit, before, since, until)
+    if cursor is None and backend.has_archive(username, data_type):
+        # Out of recent entries: carry on into the archive from the same spot.
+        history = load_history(username, data_type)
+        hi = len(entries) if before is None else int(before)
+        return _history_page(username, data_type, limit, len(history) - len(entries) + hi,
+                             since, until)
+    return page, cursor
+
+
+# Cursors into the full history (recent plus archived entries) carry this prefix.
+_ARCHIVED = "a"
+
+
+def _history_page(username, data_type, limit, before, since, until):
+    page, cursor = page_list(load_history(username, data_type), limit, before, since, until)
+    return page, (_ARCHIVED + cursor if cursor is not None else None)
+
+
+def _status_index(username, data_type):
+    # Rebuilt (in one pass over the cached list) whenever the data changes.
+    version = (get_backend().version(username), data_type)
+    index = _status_indexes.get(username)
+    if index is None or version[0] is None or index.version != version:
+        index = StatusIndex(load_user_data(username, data_type), version)
+        _status_indexes.put(username, index)
+    return index
+
+
+def _find_entry(username, data_type, entry_id):
+    for entry in load_history(username, data_type):
+        if isinstance(entry, Mapping) and entry.get('id') == entry_id:
+            return entry
+    return None
+
+
+@timed_call("storage.search_entries")
+def search_entries(username, query, limit=20):
+    """Ranked keyword/prefix search over a user's entries.
+
+    Returns ``(data_type, entry)`` pairs, best match first.
+    """
+    index = _search_index(username)
+    with index.lock:
+        return [(data_type, entry) for _, data_type, entry in index.search(query, limit)]
+
+
+def warm_search_index(username):
+    """Start building the user's search index in the background, unless
+    it is current or already being built, so the first search needn't wait."""
+    if _current_search_index(username, get_backend().version(username)) is None:
+        _start_index_build(username)
+
+
+def _current_search_index(username, version):
+    index = _search_indexes.get(username)
+    if index is not None and (version is None or index.version == version):
+        return index
+    return None
+
+
+def _search_index(username):
+    # A build that started before the latest change is waited for, then
+    # superseded by one more.
+    for _ in range(2):
+        version = get_backend().version(username)
+        index = _current_search_index(username, version)
+        if index is not None:
+            return index
+        index = _start_index_build(username).result()
+    return index
+
+
+def _start_index_build(username):
+    with _index_builds_lock:
+        future = _index_builds.get(username)
+        if future is None:
+            future = _index_builds[username] = _index_pool.submit(_build_search_index, username)
+    return future
+
+
+def _build_search_index(username):
+    try:
+        # Versioned as of before the load, so a change during it shows.
+        version = get_backend().version(username)
+        index = build_index(load_history(username), version)
+        _search_indexes.put(username, index)
+        return index
+    finally:
+        with _index_builds_lock:
+            _index_builds.pop(username, None)
+
+
+def _invalidate(username):
+    _cache.invalidate(username)
+    for data_type in (None,) + DATA_TYPES:
+        _history_cache.invalidate((username, data_type))
+
+
+def _update_index(username, apply):
+    # Only indexes already in memory are maintained; others are built from
+    # scratch on the user's next search.
+    index = _search_indexes.get(username)
+    if index is not None:
+        with index.lock:
+            apply(index)
+            index.version = get_backend().version(username)
+
+
+@timed_call("storage.get_summary")
+def get_summary(username):
+    """Entry counts for the user, built once from history if missing."""
+    summary = get_backend().load_aux(username, 'summary')
+    if summary is None:
+        with get_backend().lock(username, 'summary'):
+            summary = get_backend().load_aux(username, 'summary')
+            if summary is None:
+                summary = summaries.build_summary(get_backend().load_history(username))
+                get_backend().save_aux(username, 'summary', summary)
+    return summary
+
+
+def _update_summary(username, apply, *args):
+    with get_backend().lock(username, 'summary'):
+        summary = get_backend().load_aux(username, 'summary')
+        apply(summary, *args)
+        get_backend().save_aux(username, 'summary', summary)
+
+
+@timed_call("storage.load_user_data")
+def load_user_data(username, data_type=None):
+    """Load a user's entries, served from the shared cache when unchanged.
+
+    Returns a read-only :class:`~storage.cache.Snapshot` (or one type's
+    tuple of entries) shared between sessions; go through the save
+    functions to change anything, or ``thaw()`` it for a private copy.
+    """
+    backend = get_backend()
+    version = backend.version(username)
+    user_data = _cache.get(username, version)
+    if user_data is None:
+        user_data = _cache.put(username, version, backend.load(username))
+    if data_type:
+        return user_data.get(data_type, ())
+    return user_data
+
+
+@timed_call("storage.load_history")
+def load_history(username, data_type=None):
+    """Like :func:`load_user_data`, including archived entries.
+
+    Reads the archive, so only call it for things that need old entries
+    (paging past recent ones, search, import de-duplication).
+    """
+    backend = get_backend()
+    types = (data_type,) if data_type else DATA_TYPES
+    if not any(backend.has_archive(username, each) for each in types):
+        return load_user_data(username, data_type)
+    version = backend.version(username)
+    key = (username, data_type)
+    user_data = _history_cache.get(key, version)
+    if user_data is None:
+        loaded = backend.load_history(username, data_type)
+        user_data = _history_cache.put(key, version,
+                                       {data_type: loaded} if data_type else loaded)
+    if data_type:
+        return user_data[data_type]
+    return user_data
+
+
+def memory_report():
+    """How this process's memory budget is spent, cache by cache."""
+    return _budget.report()
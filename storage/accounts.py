@@ -0,0 +1,135 @@
+"""Account index and password hashing.
+
+Passwords are stored as salted scrypt hashes (``scrypt$n$r$p$salt$hash``).
+Hashing is slow on purpose, so it runs in a small shared thread pool
+(``GROWTH_HASH_WORKERS``, default 4): a burst of logins queues there
+instead of occupying every core, and because hashlib releases the GIL
+while hashing, other sessions keep rendering meanwhile.  Accounts created
+before hashing keep their plaintext password until their next successful
+login, which replaces it with a hash.
+
+:class:`AccountIndex` holds every account in memory after first use, so
+logins and the dashboard's ``account_exists`` check don't read files, and
+sign-ups go through it to keep usernames unique.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from storage.paths import folded, normalize
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+HASH_WORKERS = int(os.environ.get("GROWTH_HASH_WORKERS", "4"))
+
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def hash_password(password, salt=None):
+    salt = salt or os.urandom(16)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt,
+                            n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored):
+    return stored.startswith("scrypt$")
+
+
+def verify_password(password, stored):
+    """Check ``password`` against a stored hash (or legacy plaintext)."""
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    _, n, r, p, salt, digest = stored.split("$")
+    candidate = hashlib.scrypt(password.encode("utf-8"), salt=bytes.fromhex(salt),
+                               n=int(n), r=int(r), p=int(p), dklen=len(digest) // 2)
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+def in_pool(fn, *args):
+    """Run ``fn`` on the hashing pool and wait for its result."""
+    return _pool.submit(fn, *args).result()
+
+
+# Checked against when a username doesn't exist, so a failed login takes
+# as long either way.
+_DUMMY_HASH = hash_password("not a real password")
+
+
+class AccountIndex:
+    """Every account, keyed by normalised username, shared across sessions.
+
+    Loaded from the backend once, on first use, and updated on sign-up.
+    Lookups that miss fall back to the backend, which picks up accounts
+    created by other processes; so does a sign-up whose name looks free,
+    through the backend's case-insensitive :meth:`find_username`.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._accounts = None
+        # casefolded username -> normalised username, for uniqueness checks
+        self._folded = {}
+        self._lock = threading.Lock()
+
+    def _loaded(self):
+        if self._accounts is None:
+            with self._lock:
+                if self._accounts is None:
+                    accounts = {}
+                    for account in self.backend.accounts():
+                        accounts[normalize(account['username'])] = account
+                    self._folded = {folded(key): key for key in accounts}
+                    self._accounts = accounts
+        return self._accounts
+
+    def _remember(self, account):
+        key = normalize(account['username'])
+        with self._lock:
+            self._accounts[key] = account
+            self._folded[folded(key)] = key
+
+    def get(self, username):
+        account = self._loaded().get(normalize(username))
+        if account is None:
+            account = self.backend.get_account(username)
+            if account is not None:
+                self._remember(account)
+        return account
+
+    def is_taken(self, username):
+        """True if an account exists with this name, ignoring case."""
+        self._loaded()
+        if folded(username) in self._folded:
+            return True
+        # Maybe created by another process since the index was loaded.
+        existing = self.backend.find_username(username)
+        if existing is None:
+            return False
+        account = self.backend.get_account(existing)
+        if account is not None:
+            self._remember(account)
+        return True
+
+    def create(self, account):
+        """Save a new account; returns False if the username is taken."""
+        # Locked by the folded name, so "Dave" and "dave" wait for each other.
+        with self.backend.lock(folded(account['username']), "signup"):
+            if self.is_taken(account['username']):
+                return False
+            self.backend.save_account(account)
+            self._remember(account)
+        return True
+
+    def save(self, account):
+        """Save an account, replacing any existing one with that name."""
+        self._loaded()
+        self.backend.save_account(account)
+        self._remember(account)
+
+
+def dummy_check(password):
+    verify_password(password, _DUMMY_HASH)
@@ -0,0 +1,94 @@
+"""Compressed archive segments for old entries (the cold tier).
+
+When :mod:`storage.journal` compacts a user's journal, reflections and
+mistake notes older than ``GROWTH_ARCHIVE_DAYS`` (default 90) move out of
+the snapshot into archive segments: one gzip-compressed codec file per
+type and batch, ``archive.<type>.<n>.gz`` in the user's directory.  The
+snapshot parsed on every load then only holds recent entries.
+
+Segments are written once and never changed, so decoded segments are
+cached by path, charged to the process's memory budget by size.  Which
+segments belong to the user, and any later updates or deletes aimed at
+archived entries, are recorded in the snapshot (see
+``journal._with_archive``); a segment it doesn't list is left over from a
+crash and ignored.
+"""
+import glob
+import gzip
+import os
+from bisect import bisect_left
+
+from storage import codec, records
+from storage.cache import UserDataCache
+from storage.paths import data_path
+from storage.records import entry_ts
+
+ARCHIVE_DAYS = float(os.environ.get("GROWTH_ARCHIVE_DAYS", "90"))
+ARCHIVE_TYPES = ("reflections", "mistakes")
+# Old entries stay in the snapshot until there are at least this many,
+# so segments don't end up tiny.
+MIN_SEGMENT = int(os.environ.get("GROWTH_ARCHIVE_MIN", "200"))
+COMPRESSLEVEL = 6
+
+# Keyed by path.  A segment never changes, but after a rewrite its number
+# can be used again, so the file's mtime and size serve as its version.
+_segments = UserDataCache(name="archive segments")
+
+
+def segment_path(username, data_type, seq):
+    return data_path(username, f"archive.{data_type}.{seq}.gz")
+
+
+def segments_on_disk(username, data_type):
+    """Segment numbers present for one type, listed or not, oldest first."""
+    prefix = segment_path(username, data_type, "")[:-len(".gz")]
+    seqs = []
+    for path in glob.glob(glob.escape(prefix) + "*.gz"):
+        seq = path[len(prefix):-len(".gz")]
+        if seq.isdigit():
+            seqs.append(int(seq))
+    return sorted(seqs)
+
+
+def has_segments(username, data_type):
+    return data_type in ARCHIVE_TYPES and bool(segments_on_disk(username, data_type))
+
+
+def split(entries, cutoff):
+    """``(old, recent)``: the entries before epoch ``cutoff`` and the rest.
+
+    Entries are in time order, so the old ones are a prefix.  Nothing is
+    split off until there are ``MIN_SEGMENT`` of them.
+    """
+    n = bisect_left(entries, cutoff, key=entry_ts)
+    if n < MIN_SEGMENT:
+        return [], entries
+    return entries[:n], entries[n:]
+
+
+def write_segment(path, data_type, entries):
+    """Write a compressed segment to ``path`` (a temp name; the caller
+    renames it into place)."""
+    data = codec.dumps([records.to_dict(data_type, entry) for entry in entries])
+    with open(path, "wb") as f:
+        f.write(gzip.compress(data, COMPRESSLEVEL))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_segment(username, data_type, seq):
+    """A segment's entries as new records (the decoded file is cached)."""
+    path = segment_path(username, data_type, seq)
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        version = (stat.st_mtime_ns, stat.st_size)
+        segment = _segments.get(path, version)
+        if segment is None:
+            segment = _segments.put(path, version,
+                                    {'entries': codec.loads(gzip.decompress(f.read()))})
+    return [records.from_dict(data_type, entry) for entry in segment['entries']]
+
+
+def forget(path):
+    """Drop a removed segment from the cache."""
+    _segments.invalidate(path)
@@ -0,0 +1,114 @@
+"""Interface every storage backend implements."""
+from storage.fileio import user_lock
+from storage.paths import folded
+
+
+class StorageBackend:
+    """Accounts plus per-user entries (goals, reflections, mistakes, ...).
+
+    Backends are created once per process and shared by every Streamlit
+    session, so implementations must be thread-safe.
+    """
+
+    def get_account(self, username):
+        raise NotImplementedError
+
+    def save_account(self, account):
+        raise NotImplementedError
+
+    def account_exists(self, username):
+        return self.get_account(username) is not None
+
+    def find_username(self, username):
+        """The existing username equal to ``username`` ignoring case, or None.
+
+        This default scans every account; backends override it with a
+        lookup by the case-folded name.
+        """
+        key = folded(username)
+        for name in self.usernames():
+            if folded(name) == key:
+                return name
+        return None
+
+    def usernames(self):
+        raise NotImplementedError
+
+    def accounts(self):
+        """Yield every account (used to load the account index)."""
+        for username in self.usernames():
+            account = self.get_account(username)
+            if account is not None:
+                yield account
+
+    def add_entry(self, username, data_type, entry):
+        raise NotImplementedError
+
+    def add_entries(self, username, data_type, entries):
+        for entry in entries:
+            self.add_entry(username, data_type, entry)
+
+    def iter_entries(self, username, data_type, chunk_size=10000):
+        """Yield a user's entries of one type in lists of up to ``chunk_size``."""
+        entries = self.load_history(username, data_type)
+        for start in range(0, len(entries), chunk_size):
+            yield entries[start:start + chunk_size]
+
+    def update_entry(self, username, data_type, entry_id, changes):
+        """Merge ``changes`` into one entry, found by its ``id``."""
+        raise NotImplementedError
+
+    def delete_entry(self, username, data_type, entry_id):
+        raise NotImplementedError
+
+    def replace_user_data(self, username, user_data):
+        """Overwrite a user's whole history (maintenance tools only)."""
+        raise NotImplementedError
+
+    def load(self, username, data_type=None):
+        """Return all entries for a user, or just one type's list.
+
+        Backends that archive old entries leave those out; see load_history.
+        """
+        raise NotImplementedError
+
+    def load_history(self, username, data_type=None):
+        """Like load(), including archived entries (read on demand only)."""
+        return self.load(username, data_type)
+
+    def has_archive(self, username, data_type):
+        """True if some of the user's entries of this type are archived."""
+        return False
+
+    # Backends that can page with their own index set this and implement
+    # page(); others are paged from the cached full load.
+    indexed_paging = False
+
+    def page(self, username, data_type, limit, before=None, since=None, until=None,
+             status=None):
+        raise NotImplementedError
+
+    def load_aux(self, username, name):
+        """Small per-user side record (e.g. the summary), or None."""
+        raise NotImplementedError
+
+    def save_aux(self, username, name, value):
+        raise NotImplementedError
+
+    def flush(self, username=None):
+        """Make queued writes durable (nothing to do for synchronous backends)."""
+
+    def lock(self, username, name="data"):
+        """Exclusive lock on one of a user's resources, for read-modify-write
+        sequences in the facade (see :func:`storage.fileio.user_lock`)."""
+        return user_lock(username, name)
+
+    def prefetch(self, username):
+        """Warm client-side caches at the start of a rerun (remote backends)."""
+
+    def version(self, username):
+        """Token that changes whenever the user's entries change.
+
+        Used to validate cached reads; None means "don't cache".
+        """
+        return None
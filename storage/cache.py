@@ -0,0 +1,204 @@
+"""Shared, memory-bounded caches of loaded user data.
+
+Loaded data is frozen into one read-only :class:`Snapshot` per user and
+version, and every session is handed that same object instead of its own
+parsed copy.  A change to the user's data never touches a snapshot in
+place: the next load after it builds a new one (copy-on-write at snapshot
+granularity), and sessions still rendering the old one keep a consistent
+view until they let go of it.  ``thaw()`` gives a caller a private mutable
+copy.
+
+Entries are tagged with the backend's version token, so a cached copy is
+only served while the underlying files (or rows) are unchanged.  All the
+caches in the process (loaded data, archive segments, search and status
+indexes, analytics results) charge the one :data:`BUDGET`
+(``GROWTH_MEMORY_BYTES``); past it, the least recently used item of any
+cache is evicted.  An evicted snapshot lives on while some session still
+references it (Python's reference count), and a weak registry lets the
+next load of that version reuse it rather than parse a second copy.
+"""
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+from storage.records import Record
+
+MAX_BYTES = int(os.environ.get("GROWTH_MEMORY_BYTES",
+                               os.environ.get("GROWTH_CACHE_BYTES", str(128 * 1024 * 1024))))
+
+
+_SCALARS = (str, int, float, type(None))
+
+
+def estimate_size(obj):
+    """Rough deep size of a JSON-like structure or record, in bytes."""
+    if isinstance(obj, _SCALARS):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(map(estimate_size, obj))
+    if isinstance(obj, Record):
+        return sys.getsizeof(obj) + sum(map(estimate_size, obj.slot_values()))
+    return sys.getsizeof(obj)
+
+
+def estimate_entries_size(entries, sample=64):
+    """:func:`estimate_size` of a sequence of similar entries, scaled up
+    from an evenly spaced sample so large histories cost little to size."""
+    n = len(entries)
+    if n <= sample:
+        return sum(map(estimate_size, entries))
+    step = n / sample
+    return int(sum(estimate_size(entries[int(i * step)]) for i in range(sample)) * step)
+
+
+class Snapshot(dict):
+    """Read-only ``{data_type: tuple of entries}`` shared between sessions."""
+
+    __slots__ = ('__weakref__', 'version', 'nbytes')
+
+    def __init__(self, user_data, version=None):
+        super().__init__((key, tuple(value) if isinstance(value, list) else value)
+                         for key, value in user_data.items())
+        self.version = version
+        self.nbytes = None
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("snapshots are shared between sessions; use thaw() for a copy")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def thaw(self):
+        """A private mutable copy; the entries themselves are still shared."""
+        return {key: list(value) if isinstance(value, tuple) else value
+                for key, value in self.items()}
+
+
+class MemoryBudget:
+    """A byte limit shared by several caches, evicting LRU across all of them.
+
+    Caches register themselves, share ``lock``, and implement
+    ``_discard(key)`` (called with the lock held) and ``report()``.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.caches = []
+        # (cache, key) -> bytes, least recently used first
+        self._order = OrderedDict()
+
+    def register(self, cache):
+        self.caches.append(cache)
+
+    def charge(self, cache, key, size):
+        self._order[(cache, key)] = size
+        self.size += size
+        while self.size > self.max_bytes and len(self._order) > 1:
+            victim, victim_key = next(iter(self._order))
+            victim._discard(victim_key)
+            self.evictions += 1
+
+    def touch(self, cache, key):
+        self._order.move_to_end((cache, key))
+
+    def release(self, cache, key):
+        self.size -= self._order.pop((cache, key), 0)
+
+    def report(self):
+        with self.lock:
+            caches = [cache.report() for cache in self.caches]
+            return {'max_bytes': self.max_bytes, 'used_bytes': self.size,
+                    'evictions': self.evictions, 'caches': caches}
+
+
+# The budget every cache in the process charges.
+BUDGET = MemoryBudget()
+
+
+class UserDataCache:
+    """Snapshots keyed by user (or any hashable key), charged to a budget."""
+
+    def __init__(self, budget=None, name="user data"):
+        self.budget = budget or BUDGET
+        self.budget.register(self)
+        self.name = name
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = {}
+        # The last snapshot handed out per key, while anything still holds it.
+        self._live = weakref.WeakValueDictionary()
+        self._lock = self.budget.lock
+
+    def get(self, key, version):
+        """The shared snapshot for ``key`` if it is still at ``version``, else None."""
+        if version is None:
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] == version:
+                self.budget.touch(self, key)
+                self.hits += 1
+                return item[1]
+            snapshot = self._live.get(key)
+            if snapshot is not None and snapshot.version == version:
+                # Evicted, but a session still holds it: take it back in.
+                self._admit(key, snapshot)
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            return None
+
+    def put(self, key, version, data):
+        """Freeze ``data`` into a snapshot, cache it and return the snapshot."""
+        snapshot = Snapshot(data, version)
+        if version is None:
+            return snapshot
+        snapshot.nbytes = estimate_size(snapshot)
+        with self._lock:
+            self._live[key] = snapshot
+            if snapshot.nbytes <= self.budget.max_bytes:
+                self._admit(key, snapshot)
+        return snapshot
+
+    def _admit(self, key, snapshot):
+        self._discard(key)
+        self._items[key] = (snapshot.version, snapshot, snapshot.nbytes)
+        self.size += snapshot.nbytes
+        self.budget.charge(self, key, snapshot.nbytes)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._discard(key)
+            self._live.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._items):
+                self._discard(key)
+            self._live.clear()
+
+    def _discard(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= item[2]
+            self.budget.release(self, key)
+
+    def report(self):
+        """Called by the budget with the lock held."""
+        cached = {key: item[2] for key, item in self._items.items()}
+        # Evicted snapshots that sessions are still holding on to
+        held = [snapshot.nbytes or 0 for key, snapshot in list(self._live.items())
+                if key not in cached]
+        largest = sorted(cached.items(), key=lambda item: -item[1])[:5]
+        return {'name': self.name, 'items': len(cached), 'bytes': self.size,
+                'evicted_in_use': len(held), 'evicted_in_use_bytes': sum(held),
+                'hits': self.hits, 'misses': self.misses,
+                'largest': [[str(key), size] for key, size in largest]}
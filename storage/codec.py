@@ -0,0 +1,41 @@
+"""Serialization codec for everything written under ``users/``.
+
+Uses ``orjson`` when it is installed (several times faster than the
+standard library at both parsing and encoding) and falls back to stdlib
+``json`` otherwise.  ``GROWTH_CODEC=json`` forces the fallback.  Both
+produce plain JSON, so files written with one are read by the other.
+"""
+import json
+import os
+
+NAME = os.environ.get("GROWTH_CODEC", "orjson")
+
+# orjson.JSONDecodeError subclasses this, so callers catch one type.
+DecodeError = json.JSONDecodeError
+
+if NAME == "orjson":
+    try:
+        import orjson
+    except ImportError:
+        NAME = "json"
+
+if NAME == "orjson":
+    def dumps(obj):
+        """Encode ``obj`` as compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+else:
+    NAME = "json"
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj):
+        """Encode ``obj`` as compact UTF-8 JSON bytes."""
+        return _encoder.encode(obj).encode("utf-8")
+
+    loads = json.loads
+
+
+def dumps_str(obj):
+    """Like :func:`dumps` but returns text (SQLite columns)."""
+    return dumps(obj).decode("utf-8")
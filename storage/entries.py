@@ -0,0 +1,70 @@
+"""Helpers for entry IDs and cleaning up entry lists."""
+import hashlib
+import json
+import uuid
+from collections.abc import Mapping
+
+
+def new_entry_id():
+    return uuid.uuid4().hex
+
+
+def legacy_entry_id(data_type, entry):
+    """Deterministic ID for entries written before IDs existed.
+
+    Derived from the entry's content so it stays the same across loads until
+    the entry is rewritten with its ID stored alongside it.
+    """
+    digest = hashlib.sha1(
+        (data_type + json.dumps(entry, sort_keys=True)).encode("utf-8")).hexdigest()
+    return "legacy-" + digest[:16]
+
+
+def assign_missing_ids(user_data):
+    """Give every dict entry an ``id``; returns True if any were added."""
+    changed = False
+    for data_type, entries in user_data.items():
+        if not isinstance(entries, list):
+            continue
+        for entry in entries:
+            if isinstance(entry, dict) and 'id' not in entry:
+                entry['id'] = legacy_entry_id(data_type, entry)
+                changed = True
+    return changed
+
+
+def repaired_user_data(user_data):
+    """``user_data`` with every entry list flattened and every entry given an ID."""
+    repaired = {data_type: flatten_entries(entries) if isinstance(entries, list) else entries
+                for data_type, entries in user_data.items()}
+    assign_missing_ids(repaired)
+    return repaired
+
+
+def flatten_entries(entries):
+    """Undo lists that were appended as a single entry, dropping non-dicts.
+
+    The old "Complete" handler saved the whole goals list back as one new
+    element, so a goal can appear several times with different statuses.
+    Later copies win, keeping the position of the first occurrence.
+    """
+    flat = []
+    stack = list(reversed(entries))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, Mapping):
+            flat.append(item)
+
+    merged = {}
+    for entry in flat:
+        entry_id = entry.get('id', '')
+        if entry_id and not entry_id.startswith('legacy-'):
+            key = entry_id
+        else:
+            key = (entry.get('timestamp'), json.dumps(
+                {k: v for k, v in entry.items() if k not in ('id', 'status', 'timestamp')},
+                sort_keys=True))
+        merged[key] = entry if key not in merged else {**merged[key], **entry}
+    return list(merged.values())
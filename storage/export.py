@@ -0,0 +1,175 @@
+"""Streaming export and import of entries as CSV or Parquet.
+
+Usage::
+
+    python -m storage.export export OUT.csv|OUT.parquet [--user NAME ...]
+    python -m storage.export import IN.csv|IN.parquet [--user NAME]
+
+Entries are read and written ``--chunk-size`` rows at a time, so memory
+stays bounded by one chunk (plus, for the JSON backend, one user's history)
+however large the export is.  Each row is one entry; columns not used by
+its type are left empty.  ``--user`` on import loads every row into that
+account instead of the one named in the file.
+"""
+import argparse
+import os
+from collections.abc import Mapping
+
+from storage.journal import DATA_TYPES
+from storage.records import RECORD_TYPES, parse_timestamp
+
+CHUNK_SIZE = 10000
+
+# Fields each entry type carries, in column order.
+FIELDS = {data_type: RECORD_TYPES[data_type].FIELDS if data_type in RECORD_TYPES else ()
+          for data_type in DATA_TYPES}
+COLUMNS = ['username', 'type', 'id', 'timestamp'] + list(dict.fromkeys(
+    field for fields in FIELDS.values() for field in fields))
+
+
+def _format(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported format: {fmt!r} (use csv or parquet)")
+    return fmt
+
+
+def iter_row_chunks(backend, usernames, chunk_size=CHUNK_SIZE):
+    """Yield lists of flat row dicts, at most ``chunk_size`` long."""
+    chunk = []
+    for username in usernames:
+        for data_type in DATA_TYPES:
+            for entries in backend.iter_entries(username, data_type, chunk_size):
+                for entry in entries:
+                    if not isinstance(entry, Mapping):
+                        continue
+                    row = {column: entry.get(column, '') for column in COLUMNS}
+                    row['username'] = username
+                    row['type'] = data_type
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_entries(out, backend, usernames, fmt, chunk_size=CHUNK_SIZE):
+    """Write entries to ``out`` (a path or binary file object); returns the row count."""
+    import pandas as pd
+
+    rows = 0
+    if fmt == 'csv':
+        f = open(out, 'wb') if isinstance(out, str) else out
+        try:
+            header = True
+            for chunk in iter_row_chunks(backend, usernames, chunk_size):
+                frame = pd.DataFrame(chunk, columns=COLUMNS)
+                f.write(frame.to_csv(index=False, header=header).encode('utf-8'))
+                header = False
+                rows += len(chunk)
+            if header:
+                f.write(pd.DataFrame(columns=COLUMNS).to_csv(index=False).encode('utf-8'))
+        finally:
+            if isinstance(out, str):
+                f.close()
+        return rows
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in COLUMNS])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in iter_row_chunks(backend, usernames, chunk_size):
+            table = pa.Table.from_pandas(
+                pd.DataFrame(chunk, columns=COLUMNS).astype(str), schema=schema,
+                preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    return rows
+
+
+def _read_chunks(source, fmt, chunk_size):
+    if fmt == 'csv':
+        import pandas as pd
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+        return
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+def import_entries(source, fmt, username=None, chunk_size=CHUNK_SIZE):
+    """Load rows from ``source`` through the storage facade.
+
+    Entries whose id the user already has, or had earlier in the file, are
+    skipped, so importing the same file twice is harmless, and so are rows
+    of types without fields (achievements, which are derived).  Returns ``(added, rejected)``:
+    rejected rows have a timestamp that isn't a valid date and time.
+    """
+    import storage
+
+    added = rejected = 0
+    known_ids = {}
+    for frame in _read_chunks(source, fmt, chunk_size):
+        batches = {}
+        for row in frame.fillna('').to_dict('records'):
+            owner = username or row.get('username')
+            data_type = row.get('type')
+            if not owner or not FIELDS.get(data_type):
+                continue
+            if row.get('timestamp') and parse_timestamp(str(row['timestamp'])) is None:
+                rejected += 1
+                continue
+            if owner not in known_ids:
+                known_ids[owner] = {
+                    entry.get('id') for entry_type in DATA_TYPES
+                    for entry in storage.load_history(owner, entry_type)
+                    if isinstance(entry, Mapping)}
+            if row.get('id'):
+                # Also catches repeats within the file, e.g. an all-users
+                # export imported into one account, where users share ids.
+                if str(row['id']) in known_ids[owner]:
+                    continue
+                known_ids[owner].add(str(row['id']))
+            entry = {field: row.get(field, '') for field in FIELDS[data_type]}
+            for key in ('id', 'timestamp'):
+                if row.get(key):
+                    entry[key] = str(row[key])
+            batches.setdefault((owner, data_type), []).append(entry)
+        for (owner, data_type), entries in batches.items():
+            storage.add_entries(owner, data_type, entries)
+            known_ids[owner].update(entry['id'] for entry in entries)
+            added += len(entries)
+    return added, rejected
+
+
+def main():
+    import storage
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "parquet"),
+                        help="default: taken from the file extension")
+    parser.add_argument("--user", action="append", dest="users",
+                        help="export: users to include (default all); import: target user")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    fmt = _format(args.path, args.format)
+
+    if args.command == "export":
+        backend = storage.get_backend()
+        rows = export_entries(args.path, backend, args.users or backend.usernames(), fmt,
+                              args.chunk_size)
+        print(f"Exported {rows} entries to {args.path}")
+    else:
+        target = args.users[0] if args.users else None
+        rows, rejected = import_entries(args.path, fmt, target, args.chunk_size)
+        print(f"Imported {rows} entries from {args.path}")
+        if rejected:
+            print(f"Skipped {rejected} rows with an invalid timestamp")
+
+
+if __name__ == "__main__":
+    main()
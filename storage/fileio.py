@@ -0,0 +1,145 @@
+"""Crash- and concurrency-safe file primitives used by the JSON backend."""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+from storage import codec
+from storage.paths import lock_path
+
+COALESCE_SECONDS = float(os.environ.get("GROWTH_COALESCE_MS", "2")) / 1000
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+class CorruptDataError(Exception):
+    """A stored file exists but cannot be parsed."""
+
+
+@contextmanager
+def user_lock(username, name="data"):
+    """Exclusive lock on one of a user's resources.
+
+    Serialises threads in this process and, where ``fcntl`` is available,
+    other processes sharing the same ``users/`` directory.  Lock files are
+    kept apart from the user's data so they don't move when it does.
+    """
+    key = (username, name)
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(key, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        path = lock_path(username, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+def _fsync_dir(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data):
+    """Write JSON (via :mod:`storage.codec`) to a temp file, fsync it and
+    rename it over ``path``.
+
+    Readers see either the old or the new document, never a partial one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(codec.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(path)
+
+
+def read_json(path, default=None):
+    """Load a JSON file; ``default`` if missing, CorruptDataError if damaged."""
+    try:
+        with open(path, "rb") as f:
+            return codec.loads(f.read())
+    except FileNotFoundError:
+        return default
+    except codec.DecodeError as e:
+        raise CorruptDataError(f"{path} is damaged: {e}") from e
+
+
+class _Pending:
+    __slots__ = ("item", "done", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = False
+        self.error = None
+
+
+class GroupCommit:
+    """Coalesce writes that arrive within a short window into one flush.
+
+    The first writer to arrive becomes the leader: it waits
+    ``COALESCE_SECONDS`` for others to queue up, then hands the whole batch
+    to ``flush`` (one write, one fsync).  Followers block until the batch
+    holding their item has been flushed, and see the leader's error if the
+    flush failed.
+    """
+
+    def __init__(self, flush, window=COALESCE_SECONDS):
+        self._flush = flush
+        self._window = window
+        self._cond = threading.Condition()
+        self._pending = []
+        self._leading = False
+
+    def submit(self, item):
+        pending = _Pending(item)
+        with self._cond:
+            self._pending.append(pending)
+            while not pending.done and self._leading:
+                self._cond.wait()
+            if pending.done:
+                if pending.error is not None:
+                    raise pending.error
+                return
+            self._leading = True
+
+        if self._window:
+            time.sleep(self._window)
+        with self._cond:
+            batch, self._pending = self._pending, []
+        error = None
+        try:
+            self._flush([p.item for p in batch])
+        except Exception as e:
+            error = e
+        with self._cond:
+            for p in batch:
+                p.done = True
+                p.error = error
+            self._leading = False
+            self._cond.notify_all()
+        if error is not None:
+            raise error
@@ -0,0 +1,115 @@
+"""JSON-file backend: per-user files under ``users/`` plus the entry journal.
+
+See :mod:`storage.paths` for the directory layout.
+"""
+import glob
+import os
+
+from storage import journal, records
+from storage.base import StorageBackend
+from storage.fileio import atomic_write_json, read_json, user_lock
+from storage.paths import USERS_DIR, account_path, data_path, ensure_user_dir, name_path
+
+
+# Per-user side files that share the flat users/ directory with accounts.
+AUX_SUFFIXES = ("_data", "_summary")
+
+
+class FileBackend(StorageBackend):
+
+    def get_account(self, username):
+        return read_json(account_path(username))
+
+    def save_account(self, account):
+        with user_lock(account['username'], "account"):
+            ensure_user_dir(account['username'])
+            atomic_write_json(account_path(account['username']), account)
+            path = name_path(account['username'])
+            if read_json(path) is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                atomic_write_json(path, {'username': account['username']})
+
+    def account_exists(self, username):
+        return os.path.exists(account_path(username))
+
+    def find_username(self, username):
+        # Accounts saved before names/ existed have no entry there; the
+        # account index loads those with everything else on first use.
+        entry = read_json(name_path(username))
+        if entry is not None:
+            return entry['username']
+        return username if self.account_exists(username) else None
+
+    def usernames(self):
+        names = set()
+        pattern = os.path.join(glob.escape(USERS_DIR), "*", "*", "*", "account.json")
+        for path in glob.glob(pattern):
+            account = read_json(path)
+            if account:
+                names.add(account['username'])
+        names.update(legacy_usernames())
+        return sorted(names)
+
+    def add_entry(self, username, data_type, entry):
+        journal.append(username, {'op': 'add', 'type': data_type,
+                                  'entry': records.to_dict(data_type, entry)})
+
+    def add_entries(self, username, data_type, entries):
+        journal.add_entries(username, data_type,
+                            [records.to_dict(data_type, entry) for entry in entries])
+
+    def update_entry(self, username, data_type, entry_id, changes):
+        journal.append(username, {'op': 'update', 'type': data_type, 'id': entry_id,
+                                  'changes': changes})
+
+    def delete_entry(self, username, data_type, entry_id):
+        journal.append(username, {'op': 'delete', 'type': data_type, 'id': entry_id})
+
+    def replace_user_data(self, username, user_data):
+        journal.rewrite(username, user_data)
+
+    def load(self, username, data_type=None):
+        user_data = journal.load(username)
+        if data_type:
+            return user_data.get(data_type, [])
+        return user_data
+
+    def load_history(self, username, data_type=None):
+        user_data = journal.load_history(username, data_type)
+        if data_type:
+            return user_data.get(data_type, [])
+        return user_data
+
+    def has_archive(self, username, data_type):
+        return journal.has_archive(username, data_type)
+
+    def load_aux(self, username, name):
+        return read_json(data_path(username, f"{name}.json"))
+
+    def save_aux(self, username, name, value):
+        ensure_user_dir(username)
+        atomic_write_json(data_path(username, f"{name}.json"), value)
+
+    def version(self, username):
+        # Appends grow the journal and compaction swaps both files, so their
+        # stats change on every write, including edits from other processes.
+        return (_stat(data_path(username, "data.json")),
+                _stat(data_path(username, "data.journal")))
+
+
+def legacy_usernames():
+    """Accounts still in the flat layout."""
+    names = []
+    for path in glob.glob(os.path.join(glob.escape(USERS_DIR), "*.json")):
+        name = os.path.basename(path)[:-len(".json")]
+        if not name.endswith(AUX_SUFFIXES):
+            names.append(name)
+    return names
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
@@ -0,0 +1,411 @@
+"""Append-only journal for per-user entries.
+
+Each user has a snapshot (``data.json`` in their directory, see
+:mod:`storage.paths`) plus a journal of JSON lines appended since the last
+compaction.  Saving an entry is a single line append; loading replays the journal on
+top of the snapshot.  Once the journal grows past ``COMPACT_EVERY`` records
+it is frozen into a numbered segment and folded into a new snapshot on a
+background thread, so writers never wait for the rewrite.
+
+Entries are stored in the compact form from :mod:`storage.records` and
+loaded as typed records; both files go through :mod:`storage.codec`.
+Compaction also moves old reflections and mistakes into compressed
+archive segments (see :mod:`storage.archive`), which :func:`load` skips
+and :func:`load_history` reads back in.
+
+Appends that arrive within a few milliseconds of each other are coalesced
+into a single write and fsync (see :class:`storage.fileio.GroupCommit`), and
+every file operation holds the per-user lock from :mod:`storage.fileio`.
+"""
+import glob
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+from storage import archive, codec, records
+from storage.entries import assign_missing_ids, legacy_entry_id
+from storage.fileio import CorruptDataError, GroupCommit, atomic_write_json, read_json, user_lock
+from storage.paths import data_path, ensure_user_dir
+
+DATA_TYPES = ("goals", "reflections", "mistakes", "challenges", "achievements")
+
+COMPACT_EVERY = int(os.environ.get("GROWTH_COMPACT_EVERY", "500"))
+
+_state_lock = threading.Lock()
+_committers = {}
+_tail_lengths = {}
+_compacting = set()
+# Bumped by rewrite() so an in-flight compaction knows its result is stale.
+_generations = {}
+
+
+def empty_user_data():
+    return {data_type: [] for data_type in DATA_TYPES}
+
+
+def _snapshot_path(username):
+    return data_path(username, "data.json")
+
+
+def _journal_path(username):
+    return data_path(username, "data.journal")
+
+
+def _frozen_segments(username):
+    """Frozen journal segments as ``(seq, path)`` pairs, oldest first."""
+    prefix = _journal_path(username) + "."
+    segments = []
+    for path in glob.glob(glob.escape(prefix) + "*"):
+        seq = path[len(prefix):]
+        if seq.isdigit():
+            segments.append((int(seq), path))
+    return sorted(segments)
+
+
+def _read_snapshot(username):
+    """``(user_data, seq, manifest)``; the manifest lists archive segments
+    by type and the updates/deletes still to apply to archived entries."""
+    user_data = read_json(_snapshot_path(username))
+    if user_data is None:
+        return empty_user_data(), 0, {'segments': {}, 'ops': []}
+    seq = user_data.pop("_seq", 0)
+    manifest = user_data.pop("_archive", None) or {}
+    manifest = {'segments': manifest.get('segments', {}), 'ops': manifest.get('ops', [])}
+    for data_type in DATA_TYPES:
+        user_data.setdefault(data_type, [])
+    assign_missing_ids(user_data)
+    return records.from_user_data(user_data), seq, manifest
+
+
+def _read_records(path):
+    """Yield journal records, ignoring a torn final line from a crash.
+
+    Damage anywhere else raises CorruptDataError rather than dropping data.
+    """
+    try:
+        with open(path, "rb") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return
+    for i, line in enumerate(lines):
+        try:
+            yield codec.loads(line)
+        except codec.DecodeError as e:
+            if i == len(lines) - 1 and not line.endswith(b"\n"):
+                return
+            raise CorruptDataError(f"{path} line {i + 1} is damaged: {e}") from e
+
+
+class _Replay:
+    """Applies journal records to user data with an ID index.
+
+    Updates and deletes look entries up by ID in O(1); deleted entries are
+    dropped from their lists once, when the replay finishes.  Those that
+    find no entry are kept in ``unmatched`` (they may be aimed at an
+    archived one).  Adds older than the newest entry of their type
+    (imports) put that list back in time order at the end.
+    """
+
+    def __init__(self, user_data):
+        self.user_data = user_data
+        self.index = {}
+        self.deleted = set()
+        self.unmatched = []
+        self.unsorted = set()
+        for data_type, entries in user_data.items():
+            for entry in entries:
+                if isinstance(entry, Mapping):
+                    self.index[(data_type, entry['id'])] = entry
+
+    def apply(self, record):
+        op = record["op"]
+        if op == "add":
+            entry = record["entry"]
+            if 'id' not in entry:
+                entry['id'] = legacy_entry_id(record["type"], entry)
+            entry = records.from_dict(record["type"], entry)
+            entries = self.user_data.setdefault(record["type"], [])
+            if entries and records.entry_ts(entry) < records.entry_ts(entries[-1]):
+                self.unsorted.add(record["type"])
+            entries.append(entry)
+            self.index[(record["type"], entry['id'])] = entry
+            return
+        key = (record["type"], record["id"])
+        if op == "update":
+            entry = self.index.get(key)
+            if entry is not None:
+                entry.update(record["changes"])
+            else:
+                self.unmatched.append(record)
+        elif op == "delete":
+            if self.index.pop(key, None) is not None:
+                self.deleted.add(key)
+            else:
+                self.unmatched.append(record)
+
+    def result(self):
+        if self.deleted:
+            for data_type, entries in self.user_data.items():
+                self.user_data[data_type] = [
+                    entry for entry in entries
+                    if not (isinstance(entry, Mapping) and (data_type, entry['id']) in self.deleted)]
+        for data_type in self.unsorted:
+            self.user_data[data_type].sort(key=records.entry_ts)
+        return self.user_data
+
+
+def apply_records(user_data, batch):
+    """Apply journal-style records to already loaded ``user_data``."""
+    replay = _Replay(user_data)
+    for record in batch:
+        replay.apply(record)
+    return replay.result()
+
+
+def _with_archive(username, user_data, manifest, data_types):
+    """Put the archived entries of ``data_types`` back in front of the
+    recent ones, with the manifest's pending updates and deletes applied."""
+    old = {}
+    for data_type in data_types:
+        seqs = manifest['segments'].get(data_type)
+        if seqs:
+            old[data_type] = [entry for seq in seqs
+                              for entry in archive.read_segment(username, data_type, seq)]
+    if manifest['ops']:
+        old = apply_records(old, [op for op in manifest['ops'] if op['type'] in old])
+    for data_type, entries in old.items():
+        # Imported entries can be older than archived ones.
+        user_data[data_type] = records.sort_by_time(entries + user_data.get(data_type, []))
+    return user_data
+
+
+def _replay(username, upto_seq=None, archived=()):
+    """Rebuild state from snapshot, frozen segments and the active journal.
+
+    With ``upto_seq`` only segments up to and including that sequence number
+    are applied and the active journal is skipped (used by compaction).
+    Archived entries are only included for the types in ``archived``.
+    Returns ``(user_data, seq, manifest)`` where seq is the last folded
+    segment; the manifest's ``ops`` gain any updates and deletes that may be
+    aimed at archived entries not read in.
+    """
+    user_data, seq, manifest = _read_snapshot(username)
+    if archived:
+        user_data = _with_archive(username, user_data, manifest, archived)
+    replay = _Replay(user_data)
+    for segment_seq, path in _frozen_segments(username):
+        if segment_seq <= seq:
+            continue
+        if upto_seq is not None and segment_seq > upto_seq:
+            break
+        for record in _read_records(path):
+            replay.apply(record)
+        seq = segment_seq
+    if upto_seq is None:
+        for record in _read_records(_journal_path(username)):
+            replay.apply(record)
+    manifest['ops'] = manifest['ops'] + [
+        record for record in replay.unmatched
+        if manifest['segments'].get(record['type']) and record['type'] not in archived]
+    return replay.result(), seq, manifest
+
+
+def _prepare_tail(username):
+    """Drop a torn final line left by a crash and return the record count."""
+    try:
+        with open(_journal_path(username), "r+b") as f:
+            data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete != len(data):
+                f.truncate(complete)
+            return data.count(b"\n")
+    except FileNotFoundError:
+        return 0
+
+
+def append(username, record):
+    """Append one record to the user's journal and maybe schedule compaction.
+
+    Returns once the record is durably on disk.
+    """
+    append_many(username, [record])
+
+
+def append_many(username, batch):
+    """Append several records with a single write."""
+    if not batch:
+        return
+    with _state_lock:
+        committer = _committers.get(username)
+        if committer is None:
+            committer = _committers[username] = GroupCommit(
+                lambda chunks: _write_chunks(username, chunks))
+    committer.submit(b"".join(codec.dumps(record) + b"\n" for record in batch))
+
+
+def _write_chunks(username, chunks):
+    data = b"".join(chunks)
+    with user_lock(username):
+        ensure_user_dir(username)
+        if username not in _tail_lengths:
+            _tail_lengths[username] = _prepare_tail(username)
+        with open(_journal_path(username), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        _tail_lengths[username] += data.count(b"\n")
+        tail_length = _tail_lengths[username]
+    with _state_lock:
+        should_compact = tail_length >= COMPACT_EVERY and username not in _compacting
+        if should_compact:
+            _compacting.add(username)
+    if should_compact:
+        threading.Thread(target=compact, args=(username,), daemon=True).start()
+
+
+def load(username):
+    """The user's entries, without archived ones."""
+    with user_lock(username):
+        user_data, _, _ = _replay(username)
+    return user_data
+
+
+def load_history(username, data_type=None):
+    """Like :func:`load`, but with the archived entries of ``data_type``
+    (or of every type) read back in, oldest first."""
+    with user_lock(username):
+        user_data, _, _ = _replay(
+            username, archived=(data_type,) if data_type else archive.ARCHIVE_TYPES)
+    return user_data
+
+
+def has_archive(username, data_type):
+    return archive.has_segments(username, data_type)
+
+
+def compact(username):
+    """Fold the journal into a fresh snapshot.
+
+    The active journal is renamed to the next numbered segment while holding
+    the user lock, so appends only ever wait for a rename.  The snapshot is
+    then rebuilt outside the lock; it records the last segment it contains,
+    which makes a crash at any point safe to replay.  Entries old enough to
+    archive are written to new archive segments at the same time, and only
+    become part of the user's data when the new snapshot listing them is
+    swapped in.
+    """
+    try:
+        # One compaction per user at a time, across processes too: two would
+        # share the temp files and an older one could swap in a staler snapshot.
+        with user_lock(username, "compact"):
+            with user_lock(username):
+                journal = _journal_path(username)
+                if not os.path.exists(journal):
+                    return
+                segments = _frozen_segments(username)
+                seq = (segments[-1][0] if segments else _read_snapshot(username)[1]) + 1
+                os.replace(journal, f"{journal}.{seq}")
+                _tail_lengths[username] = 0
+                generation = _generations.get(username, 0)
+
+            user_data, folded, manifest = _replay(username, upto_seq=seq)
+            archived = {data_type: list(seqs) for data_type, seqs in manifest['segments'].items()}
+            new_segments = []
+            cutoff = time.time() - archive.ARCHIVE_DAYS * 86400
+            for data_type in archive.ARCHIVE_TYPES:
+                # A snapshot written before imports were ordered may not be.
+                entries = records.sort_by_time(user_data.get(data_type, []))
+                old, user_data[data_type] = archive.split(entries, cutoff)
+                if old:
+                    # Numbers are never reused, even those of segments left by a crash.
+                    n = max(archived.get(data_type, [])
+                            + archive.segments_on_disk(username, data_type), default=0) + 1
+                    segment_tmp = archive.segment_path(username, data_type, n) + ".compact.tmp"
+                    archive.write_segment(segment_tmp, data_type, old)
+                    archived.setdefault(data_type, []).append(n)
+                    new_segments.append((segment_tmp, data_type, n))
+            user_data = records.to_user_data(user_data)
+            user_data["_seq"] = folded
+            if any(archived.values()):
+                user_data["_archive"] = {'segments': archived, 'ops': manifest['ops']}
+            tmp_path = _snapshot_path(username) + ".compact.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(codec.dumps(user_data))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Swap the snapshot and drop folded segments together so a concurrent
+            # load never sees the old snapshot without its segments.  The path is
+            # looked up again in case storage.shard moved the user meanwhile.
+            with user_lock(username):
+                if _generations.get(username, 0) != generation:
+                    os.remove(tmp_path)
+                    for segment_tmp, _, _ in new_segments:
+                        os.remove(segment_tmp)
+                    return
+                for segment_tmp, data_type, n in new_segments:
+                    os.replace(segment_tmp, archive.segment_path(username, data_type, n))
+                os.replace(tmp_path, _snapshot_path(username))
+                for segment_seq, path in _frozen_segments(username):
+                    if segment_seq <= folded:
+                        os.remove(path)
+    finally:
+        with _state_lock:
+            _compacting.discard(username)
+
+
+def rewrite(username, user_data):
+    """Replace the user's whole history with ``user_data``.
+
+    Used by maintenance tools, which pass what :func:`load_history` returned;
+    archive segments are dropped and the next compaction archives again.
+    Holds the user lock throughout so it cannot interleave with appends or
+    a compaction swap.
+    """
+    with user_lock(username):
+        _rewrite(username, user_data)
+
+
+def add_entries(username, data_type, entries):
+    """Append stored-form ``entries`` (imports), which may be old.
+
+    Entries older than the archive cutoff can predate archived ones, and the
+    recent entries must all be newer than the archived ones for paging to
+    carry on from one into the other.  So when the type has an archive and
+    such an entry arrives, the whole history is rewritten in time order
+    instead, under the same lock.
+    """
+    cutoff = time.time() - archive.ARCHIVE_DAYS * 86400
+    if not (has_archive(username, data_type)
+            and any(records.entry_ts(entry) < cutoff for entry in entries)):
+        append_many(username, [{'op': 'add', 'type': data_type, 'entry': entry}
+                               for entry in entries])
+        return
+    with user_lock(username):
+        user_data, _, _ = _replay(username, archived=archive.ARCHIVE_TYPES)
+        user_data.setdefault(data_type, []).extend(
+            records.from_dict(data_type, entry) for entry in entries)
+        _rewrite(username, user_data)
+
+
+def _rewrite(username, user_data):
+    ensure_user_dir(username)
+    segments = _frozen_segments(username)
+    seq = segments[-1][0] if segments else _read_snapshot(username)[1]
+    user_data = {data_type: records.sort_by_time(list(entries))
+                 if isinstance(entries, (list, tuple)) else entries
+                 for data_type, entries in user_data.items()}
+    atomic_write_json(_snapshot_path(username),
+                      {**records.to_user_data(user_data), "_seq": seq})
+    for _, path in segments:
+        os.remove(path)
+    for data_type in archive.ARCHIVE_TYPES:
+        for n in archive.segments_on_disk(username, data_type):
+            path = archive.segment_path(username, data_type, n)
+            os.remove(path)
+            archive.forget(path)
+    if os.path.exists(_journal_path(username)):
+        os.remove(_journal_path(username))
+    _tail_lengths[username] = 0
+    _generations[username] = _generations.get(username, 0) + 1
@@ -0,0 +1,44 @@
+"""Import the JSON ``users/`` tree into the SQLite backend.
+
+Usage::
+
+    python -m storage.migrate [--db users/growth.db]
+
+Re-running is safe: each user's entries are replaced, not duplicated.
+Histories damaged by the old goal "Complete" handler are repaired on the
+way (see :mod:`storage.repair`), since SQLite needs one row per entry and
+unique IDs; the JSON files themselves are left as they are.
+"""
+import argparse
+
+from storage.entries import repaired_user_data
+from storage.files import FileBackend
+from storage.journal import DATA_TYPES
+from storage.sqlite import DEFAULT_PATH, SqliteBackend
+
+
+def migrate(source, target):
+    migrated = 0
+    for username in source.usernames():
+        account = source.get_account(username)
+        if account is None:
+            continue
+        target.save_account(account)
+        target.delete_user_entries(username)
+        user_data = repaired_user_data(source.load_history(username))
+        for data_type in DATA_TYPES:
+            target.add_entries(username, data_type, user_data.get(data_type, []))
+        migrated += 1
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_PATH, help="SQLite database to import into")
+    args = parser.parse_args()
+    count = migrate(FileBackend(), SqliteBackend(args.db))
+    print(f"Migrated {count} users into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Windowed reads over a user's entries, newest first."""
+import sys
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from storage.cache import estimate_entries_size
+from storage.records import entry_ts, parse_timestamp
+
+PAGE_SIZE = 5
+
+
+def bound(value):
+    """Normalise a date/datetime/string bound to the entry timestamp format."""
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime("%Y-%m-%d %H:%M:%S" if hasattr(value, 'hour') else "%Y-%m-%d")
+    return str(value)
+
+
+class StatusIndex:
+    """A user's entries grouped by ``status``, each group in time order.
+
+    Built from one version of the user's data; ``version`` says which.
+    """
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.groups = {}
+        for entry in entries:
+            if isinstance(entry, Mapping):
+                self.groups.setdefault(entry.get('status'), []).append(entry)
+
+    def estimate_size(self):
+        """Bytes of the group lists plus the entries they keep alive (shared
+        with the cached snapshot while that is cached)."""
+        return (sum(map(sys.getsizeof, self.groups.values())) + sys.getsizeof(self.groups)
+                + sum(map(estimate_entries_size, self.groups.values())))
+
+
+def page_list(entries, limit=PAGE_SIZE, before=None, since=None, until=None):
+    """Page through a chronological entry list.
+
+    Entries are kept in time order (loading re-sorts imported ones), so list
+    positions act as the offset index: the cursor is the position of the
+    oldest entry returned and date bounds are found by bisecting on epoch
+    timestamps.  ``since`` is inclusive, ``until`` exclusive.  Returns
+    ``(entries newest first, next cursor)``; the cursor is None once there
+    is nothing older.
+    """
+    since, until = parse_timestamp(bound(since)), parse_timestamp(bound(until))
+    lo = bisect_left(entries, since, key=entry_ts) if since else 0
+    hi = len(entries) if before is None else int(before)
+    if until:
+        hi = min(hi, bisect_left(entries, until, key=entry_ts))
+    start = max(lo, hi - limit)
+    page = [entry for entry in reversed(entries[start:hi]) if isinstance(entry, Mapping)]
+    return page, (str(start) if start > lo else None)
@@ -0,0 +1,106 @@
+"""Where user files live on disk.
+
+Each user gets a directory named by a hash of their (NFC-normalised)
+username, spread over two levels of subdirectories::
+
+    users/3f/a2/3fa2…e1/account.json, data.json, data.journal, summary.json
+
+so no directory grows past a few hundred entries however many accounts
+there are, and usernames never become part of a path.  Lock files live
+under ``users/locks/`` so they stay put while a user is migrated, and
+``users/names/`` maps each case-folded username to the account's exact
+name, so sign-ups can check a name ignoring case with a single read.
+
+Users created before sharding keep their flat ``users/<name>.json`` and
+``users/<name>_<suffix>`` files until ``python -m storage.shard`` moves
+them; a user's files are looked up in the sharded directory if it exists
+and in the flat layout otherwise.
+"""
+import hashlib
+import os
+import threading
+import unicodedata
+
+USERS_DIR = os.environ.get("GROWTH_USERS_DIR", "users")
+LOCKS_DIR = os.path.join(USERS_DIR, "locks")
+
+# Users known to have a sharded directory; that never reverts, so checks
+# for them skip the filesystem.
+_sharded = set()
+_sharded_lock = threading.Lock()
+
+
+def normalize(username):
+    return unicodedata.normalize("NFC", username)
+
+
+def folded(username):
+    """The form usernames are compared in for uniqueness ("Dave" == "dave")."""
+    return normalize(username).casefold()
+
+
+def user_key(username):
+    return hashlib.sha256(normalize(username).encode("utf-8")).hexdigest()[:32]
+
+
+def user_dir(username):
+    """The user's sharded directory, whether or not it exists yet."""
+    key = user_key(username)
+    return os.path.join(USERS_DIR, key[:2], key[2:4], key)
+
+
+def legacy_account_path(username):
+    return os.path.join(USERS_DIR, f"{username}.json")
+
+
+def legacy_data_path(username, suffix):
+    return os.path.join(USERS_DIR, f"{username}_{suffix}")
+
+
+def _legacy_name(username):
+    # Only plain names ever had flat files; anything else must not be
+    # turned into a path.
+    return bool(username) and os.sep not in username and "\0" not in username \
+        and not username.startswith(".") and (os.altsep is None or os.altsep not in username)
+
+
+def is_legacy(username):
+    """True while the user's files are still in the flat layout."""
+    if username in _sharded:
+        return False
+    if os.path.isdir(user_dir(username)):
+        with _sharded_lock:
+            _sharded.add(username)
+        return False
+    return _legacy_name(username) and (
+        os.path.exists(legacy_account_path(username))
+        or os.path.exists(legacy_data_path(username, "data.json"))
+        or os.path.exists(legacy_data_path(username, "data.journal")))
+
+
+def account_path(username):
+    if is_legacy(username):
+        return legacy_account_path(username)
+    return os.path.join(user_dir(username), "account.json")
+
+
+def data_path(username, suffix="data.json"):
+    if is_legacy(username):
+        return legacy_data_path(username, suffix)
+    return os.path.join(user_dir(username), suffix)
+
+
+def name_path(username):
+    """File recording which account, if any, owns ``username`` ignoring case."""
+    key = hashlib.sha256(folded(username).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(USERS_DIR, "names", key[:2], f"{key}.json")
+
+
+def lock_path(username, name):
+    key = user_key(username)
+    return os.path.join(LOCKS_DIR, key[:2], f"{key}.{name}.lock")
+
+
+def ensure_user_dir(username):
+    """Create the directory ``data_path``/``account_path`` point into."""
+    os.makedirs(os.path.dirname(data_path(username)), exist_ok=True)
@@ -0,0 +1,219 @@
+"""Typed in-memory records for goals, reflections, mistakes and challenges.
+
+Loaded entries are slot-based objects rather than dicts, which takes well
+under half the memory per entry, and hold their timestamp as epoch seconds
+(``ts``) so ordering and date bounds compare integers instead of re-parsing
+strings.  Records are read-only mappings with the same keys the old dicts
+had (``entry['goal']``, ``entry.get('timestamp')``); ``timestamp`` is
+formatted from ``ts`` on access.
+
+On disk an entry is stored as ``{"id": ..., "ts": 1739870000, "goal": ...}``.
+Entries written before records existed, with a ``"timestamp"`` string, are
+read transparently and converted the next time they are rewritten.  Entry
+types without a record class (``achievements``) stay plain dicts.
+"""
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_MISSING = object()
+
+
+def parse_timestamp(value):
+    """Epoch seconds for a ``"%Y-%m-%d %H:%M:%S"`` local time, or None."""
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def format_timestamp(ts):
+    return time.strftime(TIMESTAMP_FORMAT, time.localtime(ts))
+
+
+class Record(Mapping):
+    """Base class; subclasses list their content keys in ``FIELDS``.
+
+    ``extra`` keeps any keys a stored entry had beyond the known ones, so
+    nothing is lost on a round trip.  Records are shared between sessions
+    through the cache; only the journal replay changes them, via
+    :meth:`update`, before they are handed out.
+    """
+
+    __slots__ = ('id', 'ts', 'extra')
+    FIELDS = ()
+
+    @classmethod
+    def from_dict(cls, entry):
+        record = cls.__new__(cls)
+        get = entry.get
+        record.id = get('id')
+        record.ts = get('ts')
+        record.extra = None
+        for field in cls.FIELDS:
+            setattr(record, field, get(field))
+        if record.ts is not None and entry.keys() <= cls._known:
+            return record
+        for key, value in entry.items():
+            if key == 'timestamp' and record.ts is None:
+                record.ts = parse_timestamp(value)
+                if record.ts is not None:
+                    continue
+            if key not in cls._known:
+                if record.extra is None:
+                    record.extra = {}
+                record.extra[key] = value
+        return record
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls._known = frozenset(('id', 'ts', 'timestamp') + cls.FIELDS)
+
+    def to_dict(self):
+        """The stored form of the record."""
+        entry = {'id': self.id}
+        if self.ts is not None:
+            entry['ts'] = self.ts
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                entry[field] = value
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    def update(self, changes):
+        """Apply stored-form ``changes`` in place (journal replay only)."""
+        for key, value in changes.items():
+            if key in self.FIELDS or key in ('id', 'ts'):
+                setattr(self, key, value)
+            elif key == 'timestamp' and parse_timestamp(value) is not None:
+                self.ts = parse_timestamp(value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def _lookup(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return _MISSING if value is None else value
+        if key == 'id':
+            return self.id
+        if key == 'timestamp' and self.ts is not None:
+            return format_timestamp(self.ts)
+        if self.extra is not None:
+            return self.extra.get(key, _MISSING)
+        return _MISSING
+
+    def __iter__(self):
+        yield 'id'
+        if self.ts is not None:
+            yield 'timestamp'
+        for field in self.FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def slot_values(self):
+        """Every stored value, for size estimates."""
+        return [self.id, self.ts, self.extra] + [getattr(self, f) for f in self.FIELDS]
+
+
+class Goal(Record):
+    __slots__ = FIELDS = ('goal', 'status')
+
+
+class Reflection(Record):
+    __slots__ = FIELDS = ('reflection', 'challenges', 'solutions')
+
+
+class Mistake(Record):
+    __slots__ = FIELDS = ('mistake', 'learning')
+
+
+class Challenge(Record):
+    __slots__ = FIELDS = ('challenge', 'notes')
+
+
+RECORD_TYPES = {
+    'goals': Goal,
+    'reflections': Reflection,
+    'mistakes': Mistake,
+    'challenges': Challenge,
+}
+
+
+def from_dict(data_type, entry):
+    """The record for a stored entry; other values are returned unchanged."""
+    cls = RECORD_TYPES.get(data_type)
+    if cls is None or not isinstance(entry, dict):
+        return entry
+    return cls.from_dict(entry)
+
+
+def to_dict(data_type, entry):
+    """The stored form of an entry given as a record or an old-style dict."""
+    if isinstance(entry, Record):
+        return entry.to_dict()
+    cls = RECORD_TYPES.get(data_type)
+    if cls is None or not isinstance(entry, dict):
+        return entry
+    return cls.from_dict(entry).to_dict()
+
+
+def from_user_data(user_data):
+    """Convert every entry list of ``user_data`` to records, in place."""
+    for data_type, entries in user_data.items():
+        if data_type in RECORD_TYPES and isinstance(entries, list):
+            user_data[data_type] = [from_dict(data_type, entry) for entry in entries]
+    return user_data
+
+
+def to_user_data(user_data):
+    """A stored-form copy of ``user_data``."""
+    return {data_type: [to_dict(data_type, entry) for entry in entries]
+            if isinstance(entries, list) else entries
+            for data_type, entries in user_data.items()}
+
+
+def entry_ts(entry):
+    """Epoch seconds of any entry, 0 if it has none."""
+    if isinstance(entry, Record):
+        return entry.ts or 0
+    if isinstance(entry, dict):
+        return entry.get('ts') or parse_timestamp(entry.get('timestamp')) or 0
+    return 0
+
+
+def sort_by_time(entries):
+    """Stable-sort ``entries`` in place by time if any is out of order.
+
+    Entries are normally appended in time order; imports with older
+    timestamps are the exception, and paging and archiving bisect on time.
+    """
+    ts = list(map(entry_ts, entries))
+    if any(a > b for a, b in zip(ts, ts[1:])):
+        entries.sort(key=entry_ts)
+    return entries
@@ -0,0 +1,486 @@
+"""Storage server and client, so several app replicas can share one store.
+
+Usage::
+
+    python -m storage.remote [--host 127.0.0.1] [--port 8765] [--backend files|sqlite]
+
+runs a server in front of a local backend.  Replicas set
+``GROWTH_STORAGE=remote`` and ``GROWTH_REMOTE_ADDRESS=host:port`` and then
+read and write through it instead of their own ``users/`` directory.
+
+The protocol is a stream of frames, each a 4-byte big-endian length and a
+:mod:`storage.codec` document.  A request carries a batch of backend calls,
+``{"calls": [[method, args], ...]}``, answered by one ``{"results": [...]}``
+frame (or ``{"error": ..., "type": ...}``), so several calls cost a single
+round trip.  Entries travel in the stored form from :mod:`storage.records`.
+When ``GROWTH_REMOTE_TOKEN`` is set, each connection must send it first;
+the server refuses to listen beyond the loopback interface without one, as
+it hands out password hashes and whole histories to anyone connected.
+
+Per-user locks (summary updates, sign-up) are held by the server on the
+locking client's connection, so they hold across replicas; the server
+drops them if that connection goes away.
+
+:class:`RemoteBackend` keeps a pool of connections and caches version
+tokens and side records for ``GROWTH_REMOTE_TTL_MS`` (default 500), so the
+many freshness checks of a rerun don't each cost a round trip; its own
+writes drop the cached values at once, other replicas' writes show up
+within the TTL.  Reads made while holding a lock skip the cache, so a
+locked read-modify-write always starts from the server's current value.
+:meth:`RemoteBackend.prefetch` fills that cache for a user with one
+request at the top of a rerun.
+"""
+import argparse
+import hmac
+import ipaddress
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import ExitStack, contextmanager
+
+import metrics
+from storage import codec, records
+from storage.base import StorageBackend
+from storage.fileio import CorruptDataError
+from storage.paging import bound
+
+ADDRESS = os.environ.get("GROWTH_REMOTE_ADDRESS", "127.0.0.1:8765")
+TOKEN = os.environ.get("GROWTH_REMOTE_TOKEN", "")
+POOL_SIZE = int(os.environ.get("GROWTH_REMOTE_POOL", "4"))
+CACHE_SECONDS = float(os.environ.get("GROWTH_REMOTE_TTL_MS", "500")) / 1000
+TIMEOUT = float(os.environ.get("GROWTH_REMOTE_TIMEOUT", "30"))
+MAX_FRAME = 256 * 1024 * 1024
+MAX_CACHED_USERS = 4096
+
+# Backend methods clients may call, besides info/lock/unlock.
+METHODS = frozenset((
+    "get_account", "save_account", "account_exists", "find_username", "usernames",
+    "accounts", "add_entries", "update_entry", "delete_entry", "replace_user_data",
+    "load", "load_history", "has_archive", "page", "load_aux", "save_aux",
+    "flush", "version",
+))
+# Safe to send again on a fresh connection if the first one turned out dead.
+READS = frozenset((
+    "info", "get_account", "account_exists", "find_username", "usernames", "accounts",
+    "load", "load_history", "has_archive", "page", "load_aux", "version",
+))
+
+_HEADER = struct.Struct(">I")
+
+logger = logging.getLogger("growth.storage")
+
+
+class RemoteError(Exception):
+    """The storage server could not carry out a call."""
+
+
+def write_frame(wfile, message):
+    data = codec.dumps(message)
+    wfile.write(_HEADER.pack(len(data)) + data)
+    wfile.flush()
+
+
+def read_frame(rfile):
+    """The next message, or None if the peer closed the connection."""
+    header = rfile.read(_HEADER.size)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        raise ConnectionError("connection closed mid-frame")
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ConnectionError(f"frame of {length} bytes is too large")
+    data = rfile.read(length)
+    if len(data) < length:
+        raise ConnectionError("connection closed mid-frame")
+    return codec.loads(data)
+
+
+def _stored(value):
+    """``value`` with records replaced by their stored form, for the wire."""
+    if isinstance(value, records.Record):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return {key: _stored(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stored(item) for item in value]
+    return value
+
+
+def _frozen(value):
+    # Version tokens come back as lists; make them comparable and hashable again.
+    if isinstance(value, list):
+        return tuple(_frozen(item) for item in value)
+    return value
+
+
+# Server
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        # (username, name) -> ExitStack holding that lock for this client
+        held = {}
+        try:
+            if server.token:
+                hello = read_frame(self.rfile)
+                if not hello or not hmac.compare_digest(str(hello.get('token', '')),
+                                                        server.token):
+                    write_frame(self.wfile, {'error': "bad token", 'type': "RemoteError"})
+                    return
+                write_frame(self.wfile, {'results': []})
+            while True:
+                request = read_frame(self.rfile)
+                if request is None:
+                    return
+                try:
+                    response = {'results': [self._call(name, args, held)
+                                            for name, args in request['calls']]}
+                except Exception as e:
+                    if not isinstance(e, (CorruptDataError, RemoteError)):
+                        logger.exception("storage call failed")
+                    response = {'error': str(e), 'type': type(e).__name__}
+                write_frame(self.wfile, response)
+        except OSError:
+            pass
+        finally:
+            for stack in held.values():
+                stack.close()
+
+    def _call(self, name, args, held):
+        backend = self.server.backend
+        if name == "info":
+            return {'indexed_paging': backend.indexed_paging}
+        if name == "lock":
+            stack = ExitStack()
+            stack.enter_context(backend.lock(*args))
+            held[tuple(args)] = stack
+            return None
+        if name == "unlock":
+            held.pop(tuple(args)).close()
+            return None
+        if name not in METHODS:
+            raise RemoteError(f"Unknown storage call: {name}")
+        result = getattr(backend, name)(*args)
+        if name == "accounts":
+            result = list(result)
+        return _stored(result)
+
+
+class StorageServer(socketserver.ThreadingTCPServer):
+    """Serves ``backend`` to :class:`RemoteBackend` clients, a thread per connection."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, backend, token=TOKEN):
+        self.backend = backend
+        self.token = token
+        super().__init__(address, _Handler)
+
+
+# Client
+
+class _Connection:
+
+    def __init__(self, address, token, timeout):
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+        if token:
+            write_frame(self.wfile, {'token': token})
+            self._response()
+
+    def request(self, calls):
+        write_frame(self.wfile, {'calls': calls})
+        return self._response()
+
+    def _response(self):
+        response = read_frame(self.rfile)
+        if response is None:
+            raise ConnectionError("storage server closed the connection")
+        if 'error' in response:
+            if response.get('type') == "CorruptDataError":
+                raise CorruptDataError(response['error'])
+            raise RemoteError(response['error'])
+        return response['results']
+
+    def close(self):
+        for f in (self.rfile, self.wfile, self.sock):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+class ClientPool:
+    """Fixed-size pool of server connections usable from any thread.
+
+    A connection that fails is closed and replaced on next use.  While a
+    thread holds a server-side lock its connection stays pinned to it, so
+    calls inside the locked section don't need a second connection.
+    """
+
+    def __init__(self, address, token=TOKEN, size=POOL_SIZE, timeout=TIMEOUT):
+        self.address = address
+        self.token = token
+        self.timeout = timeout
+        # None marks a free slot that needs a new connection.
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._size = size
+        self._lock = threading.Lock()
+        self._pinned = threading.local()
+
+    def is_pinned(self):
+        return getattr(self._pinned, 'conn', None) is not None
+
+    def _borrow(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._size
+                if create:
+                    self._created += 1
+            conn = None if create else self._idle.get()
+        if conn is None:
+            try:
+                conn = _Connection(self.address, self.token, self.timeout)
+            except BaseException:
+                self._idle.put(None)
+                raise
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection (the thread's pinned one, if it has one)."""
+        pinned = getattr(self._pinned, 'conn', None)
+        if pinned is not None:
+            yield pinned
+            return
+        conn = self._borrow()
+        try:
+            yield conn
+        except OSError:
+            conn.close()
+            self._idle.put(None)
+            raise
+        except BaseException:
+            self._idle.put(conn)
+            raise
+        self._idle.put(conn)
+
+    @contextmanager
+    def pinned(self):
+        """A connection pinned to this thread for the duration."""
+        if self.is_pinned():
+            yield self._pinned.conn
+            return
+        with self.connection() as conn:
+            self._pinned.conn = conn
+            try:
+                yield conn
+            finally:
+                self._pinned.conn = None
+
+
+class RemoteBackend(StorageBackend):
+
+    def __init__(self, address=ADDRESS, token=TOKEN, pool_size=POOL_SIZE,
+                 cache_seconds=CACHE_SECONDS):
+        host, _, port = address.rpartition(":")
+        self.pool = ClientPool((host or "127.0.0.1", int(port)), token, pool_size)
+        self.cache_seconds = cache_seconds
+        self._indexed_paging = None
+        # username -> {(method, *args): (expires, encoded value)}
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def batch(self, calls):
+        """Send ``[(method, args), ...]`` in one round trip; returns the results."""
+        calls = [[name, list(args)] for name, args in calls]
+        with metrics.timed("storage.remote_request"):
+            try:
+                with self.pool.connection() as conn:
+                    return conn.request(calls)
+            except OSError:
+                if self.pool.is_pinned() or not all(name in READS for name, _ in calls):
+                    raise
+            # A pooled connection may have died with a server restart.
+            with self.pool.connection() as conn:
+                return conn.request(calls)
+
+    def call(self, name, *args):
+        return self.batch([(name, args)])[0]
+
+    # Client-side cache of small, frequently checked values
+
+    def _cached(self, name, *args):
+        key = (name,) + args
+        # Under a server-side lock the caller is about to read-modify-write,
+        # so it must see what the server has now, not a copy up to a TTL old.
+        if not self.pool.is_pinned():
+            with self._cache_lock:
+                hit = self._cache.get(args[0], {}).get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                return codec.loads(hit[1])
+        value = self.call(name, *args)
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        now = time.monotonic()
+        with self._cache_lock:
+            if len(self._cache) > MAX_CACHED_USERS:
+                self._cache = {user: items for user, items in self._cache.items()
+                               if any(expires > now for expires, _ in items.values())}
+            self._cache.setdefault(key[1], {})[key] = (now + self.cache_seconds,
+                                                       codec.dumps(value))
+
+    def _forget(self, username):
+        with self._cache_lock:
+            self._cache.pop(username, None)
+
+    def prefetch(self, username):
+        calls = [("version", (username,)), ("load_aux", (username, 'summary'))]
+        for (name, args), value in zip(calls, self.batch(calls)):
+            self._remember((name,) + args, value)
+
+    @property
+    def indexed_paging(self):
+        if self._indexed_paging is None:
+            self._indexed_paging = self.call("info")['indexed_paging']
+        return self._indexed_paging
+
+    @contextmanager
+    def lock(self, username, name="data"):
+        with self.pool.pinned() as conn:
+            conn.request([["lock", [username, name]]])
+            # Another replica may have written while we waited for the lock.
+            self._forget(username)
+            try:
+                yield
+            finally:
+                conn.request([["unlock", [username, name]]])
+
+    # Accounts
+
+    def get_account(self, username):
+        return self.call("get_account", username)
+
+    def save_account(self, account):
+        self.call("save_account", account)
+
+    def account_exists(self, username):
+        return self.call("account_exists", username)
+
+    def find_username(self, username):
+        return self.call("find_username", username)
+
+    def usernames(self):
+        return self.call("usernames")
+
+    def accounts(self):
+        return iter(self.call("accounts"))
+
+    # Entries
+
+    def add_entry(self, username, data_type, entry):
+        self.add_entries(username, data_type, [entry])
+
+    def add_entries(self, username, data_type, entries):
+        self.call("add_entries", username, data_type,
+                  [records.to_dict(data_type, entry) for entry in entries])
+        self._forget(username)
+
+    def update_entry(self, username, data_type, entry_id, changes):
+        self.call("update_entry", username, data_type, entry_id, changes)
+        self._forget(username)
+
+    def delete_entry(self, username, data_type, entry_id):
+        self.call("delete_entry", username, data_type, entry_id)
+        self._forget(username)
+
+    def replace_user_data(self, username, user_data):
+        self.call("replace_user_data", username, records.to_user_data(user_data))
+        self._forget(username)
+
+    def load(self, username, data_type=None):
+        return _entries(self.call("load", username, data_type), data_type)
+
+    def load_history(self, username, data_type=None):
+        return _entries(self.call("load_history", username, data_type), data_type)
+
+    def has_archive(self, username, data_type):
+        return self._cached("has_archive", username, data_type)
+
+    def page(self, username, data_type, limit, before=None, since=None, until=None,
+             status=None):
+        entries, cursor = self.call("page", username, data_type, limit, before,
+                                    bound(since), bound(until), status)
+        return _entries(entries, data_type), cursor
+
+    def load_aux(self, username, name):
+        return self._cached("load_aux", username, name)
+
+    def save_aux(self, username, name, value):
+        self.call("save_aux", username, name, value)
+        self._forget(username)
+
+    def flush(self, username=None):
+        self.call("flush", username)
+
+    def version(self, username):
+        return _frozen(self._cached("version", username))
+
+
+def _entries(stored, data_type):
+    if data_type:
+        return [records.from_dict(data_type, entry) for entry in stored]
+    return records.from_user_data(stored)
+
+
+def _is_loopback(host):
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0]).is_loopback for info in infos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", choices=("files", "sqlite"), default="files",
+                        help="local backend to serve")
+    args = parser.parse_args()
+    if not TOKEN and not _is_loopback(args.host):
+        parser.error(f"refusing to serve on {args.host!r} without GROWTH_REMOTE_TOKEN: "
+                     "anyone who can connect could read accounts and entries")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from storage import _create_backend
+
+    server = StorageServer((args.host, args.port), _create_backend(args.backend))
+    logger.info("Serving %s storage on %s:%d", args.backend, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.backend.flush()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
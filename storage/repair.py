@@ -0,0 +1,40 @@
+"""Repair data files damaged by the old goal "Complete" handler.
+
+Usage::
+
+    python -m storage.repair [USERNAME ...]
+
+Nested lists are flattened, duplicated goals collapse to their latest
+status and every entry gets a stable ID.  Without usernames every account
+is repaired.
+"""
+import argparse
+
+from storage import get_backend
+from storage.entries import repaired_user_data
+from storage.summary import build_summary
+
+
+def repair_user(backend, username):
+    """Repair one user; returns True if anything was rewritten."""
+    user_data = backend.load_history(username)
+    repaired = repaired_user_data(user_data)
+    changed = repaired != user_data
+    if changed:
+        backend.replace_user_data(username, repaired)
+        backend.save_aux(username, 'summary', build_summary(repaired))
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("usernames", nargs="*", help="users to repair (default: all)")
+    args = parser.parse_args()
+    backend = get_backend()
+    for username in args.usernames or backend.usernames():
+        if repair_user(backend, username):
+            print(f"Repaired {username}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Cross-user rollups for the admin page.
+
+Usage::
+
+    python -m storage.rollups [--workers N] [--out users/admin/rollups.json]
+
+Scans every user in parallel with a process pool and writes one small JSON
+document with active users, entries per day, goal completion rates, the
+most completed challenges and leaderboards.  ``pages/admin.py`` only reads
+that document, so it costs the same however many users there are.  Run it
+from cron as often as the numbers need to be fresh.
+"""
+import argparse
+import heapq
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+from storage.fileio import atomic_write_json, read_json
+from storage.paths import USERS_DIR
+
+ROLLUPS_PATH = os.environ.get("GROWTH_ROLLUPS_PATH",
+                              os.path.join(USERS_DIR, "admin", "rollups.json"))
+HISTORY_DAYS = 365
+TOP_N = 10
+ACTIVE_WINDOWS = (1, 7, 30)
+
+
+def user_rollup(username, today):
+    """Per-user figures, computed in a worker process."""
+    from storage import get_backend
+    from storage.summary import build_summary
+
+    backend = get_backend()
+    summary = backend.load_aux(username, 'summary')
+    if summary is None:
+        user_data = backend.load_history(username)
+        summary = build_summary(user_data)
+        challenges = user_data.get('challenges', [])
+    else:
+        challenges = (entry for chunk in backend.iter_entries(username, 'challenges')
+                      for entry in chunk)
+    completed_challenges = Counter(entry.get('challenge') for entry in challenges
+                                   if entry.get('challenge'))
+    days = sorted(summary['per_day'])
+    cutoff = (today - timedelta(days=30)).isoformat()
+    return {
+        'username': username,
+        'counts': summary['counts'],
+        'completed_goals': summary['completed_goals'],
+        'per_day': summary['per_day'],
+        'last_active': days[-1] if days else None,
+        'active_days_30': sum(1 for day in days if day > cutoff),
+        'challenges': completed_challenges,
+    }
+
+
+def merge(results, today):
+    """Combine per-user figures into the stored rollup document."""
+    counts = Counter()
+    per_day = {}
+    daily_active = Counter()
+    challenges = Counter()
+    active = Counter()
+    completed_goals = 0
+    users = 0
+    leaders = {'active_days_30': [], 'completed_goals': []}
+    first_day = (today - timedelta(days=HISTORY_DAYS)).isoformat()
+    for result in results:
+        users += 1
+        counts.update(result['counts'])
+        completed_goals += result['completed_goals']
+        challenges.update(result['challenges'])
+        for day, day_counts in result['per_day'].items():
+            if day > first_day:
+                per_day.setdefault(day, Counter()).update(day_counts)
+                daily_active[day] += 1
+        if result['last_active']:
+            idle = (today - date.fromisoformat(result['last_active'])).days
+            for window in ACTIVE_WINDOWS:
+                if idle < window:
+                    active[window] += 1
+        for board in leaders:
+            leaders[board].append((result[board], result['username']))
+    return {
+        'generated_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'users': users,
+        'active_users': {str(window): active[window] for window in ACTIVE_WINDOWS},
+        'entries': dict(counts),
+        'completed_goals': completed_goals,
+        'completion_rate': completed_goals / counts['goals'] if counts['goals'] else 0.0,
+        'per_day': {day: dict(per_day[day]) for day in sorted(per_day)},
+        'daily_active_users': {day: daily_active[day] for day in sorted(daily_active)},
+        'top_challenges': challenges.most_common(TOP_N),
+        'leaderboards': {board: _leaderboard(rows) for board, rows in leaders.items()},
+    }
+
+
+def _leaderboard(rows):
+    """Top users as ``[name, score]`` pairs, skipping zero scores."""
+    top = heapq.nsmallest(TOP_N, (row for row in rows if row[0]),
+                          key=lambda row: (-row[0], row[1]))
+    return [[name, score] for score, name in top]
+
+
+def compute_rollups(usernames, workers=None, today=None):
+    today = today or date.today()
+    # Spawned workers open their own backend; a forked copy of an open
+    # SQLite connection pool is not safe to use.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        chunksize = max(1, len(usernames) // ((workers or os.cpu_count() or 1) * 4))
+        results = pool.map(user_rollup, usernames, [today] * len(usernames),
+                           chunksize=chunksize)
+        return merge(results, today)
+
+
+def load_rollups(path=ROLLUPS_PATH):
+    """The last materialized rollups, or None if the job hasn't run yet."""
+    return read_json(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--out", default=ROLLUPS_PATH, help="where to write the rollups")
+    args = parser.parse_args()
+
+    from storage import get_backend
+
+    start = time.perf_counter()
+    usernames = get_backend().usernames()
+    rollups = compute_rollups(usernames, args.workers)
+    rollups['seconds'] = round(time.perf_counter() - start, 3)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    atomic_write_json(args.out, rollups)
+    print(f"Rolled up {rollups['users']} users in {rollups['seconds']}s into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Per-user inverted index for searching entries.
+
+Indexes are built from a user's history in the background (see
+``storage.warm_search_index``) and then kept current by the storage facade
+on every add/update/delete, so a query only touches the postings of its
+terms.  Ranking is BM25; the last query term also matches as a prefix so
+results update while typing.
+
+Each entry gets a small integer number, and a term's postings are also
+kept as NumPy arrays of entry numbers and term counts (made on the term's
+first query after it changes, or when the index is built for common
+terms).  A query then scores all its postings in a few vectorised
+operations and picks the top ``limit`` with a partial sort, so its cost
+stays around a millisecond even for terms in most entries.
+"""
+import math
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+
+from storage.cache import estimate_entries_size
+from storage.journal import DATA_TYPES
+
+MAX_INDEXES = int(os.environ.get("GROWTH_SEARCH_INDEXES", "64"))
+# Completions tried for a prefix; keeps short prefixes from scanning everything.
+MAX_PREFIX_TERMS = 16
+
+# Text fields searched for each entry type.
+SEARCH_FIELDS = {
+    'goals': ('goal',),
+    'reflections': ('reflection', 'challenges', 'solutions'),
+    'mistakes': ('mistake', 'learning'),
+    'challenges': ('challenge', 'notes'),
+}
+
+_TOKEN = re.compile(r"\w+")
+K1 = 1.2
+B = 0.75
+# Terms with at least this many postings get their arrays when the index
+# is built; the rest on their first query.
+PRECOMPUTE_POSTINGS = 256
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _entry_terms(data_type, entry):
+    text = " ".join(str(entry.get(field, '')) for field in SEARCH_FIELDS.get(data_type, ()))
+    return Counter(tokenize(text))
+
+
+class UserIndex:
+
+    def __init__(self, version=None):
+        self.version = version
+        self.lock = threading.Lock()
+        self.postings = {}
+        self.terms = []
+        self.docs = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        # Entry numbers: key -> n, n -> key, entry lengths by n, and the
+        # numbers of removed entries, to reuse.
+        self.numbers = {}
+        self.keys = []
+        self.lengths = array('d')
+        self._free = []
+        # term -> (entry numbers, term counts) as NumPy arrays
+        self._arrays = {}
+
+    def add(self, data_type, entry, bulk=False):
+        """Index one entry; with ``bulk`` the caller sorts ``terms`` afterwards."""
+        if data_type not in SEARCH_FIELDS or not isinstance(entry, Mapping):
+            return
+        key = (data_type, entry['id'])
+        if key in self.docs:
+            self.remove(data_type, entry['id'])
+        terms = _entry_terms(data_type, entry)
+        length = sum(terms.values())
+        if self._free:
+            n = self._free.pop()
+            self.keys[n] = key
+            self.lengths[n] = length
+        else:
+            n = len(self.keys)
+            self.keys.append(key)
+            self.lengths.append(length)
+        self.numbers[key] = n
+        self.docs[key] = entry
+        self.doc_terms[key] = terms
+        self.total_length += length
+        postings, arrays = self.postings, self._arrays
+        for term, count in terms.items():
+            posting = postings.get(term)
+            if posting is None:
+                postings[term] = {key: count}
+                if not bulk:
+                    insort(self.terms, term)
+            else:
+                posting[key] = count
+                if arrays:
+                    arrays.pop(term, None)
+
+    def remove(self, data_type, entry_id):
+        key = (data_type, entry_id)
+        terms = self.doc_terms.pop(key, None)
+        if terms is None:
+            return
+        del self.docs[key]
+        n = self.numbers.pop(key)
+        self.total_length -= self.lengths[n]
+        self.keys[n] = None
+        self.lengths[n] = 0
+        self._free.append(n)
+        for term in terms:
+            posting = self.postings[term]
+            del posting[key]
+            self._arrays.pop(term, None)
+            if not posting:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    def _expand(self, term):
+        """The closest indexed terms starting with ``term`` (shortest first)."""
+        start = bisect_left(self.terms, term)
+        end = bisect_left(self.terms, term + "\uffff")
+        if end - start <= MAX_PREFIX_TERMS:
+            return self.terms[start:end]
+        return sorted(self.terms[start:end], key=len)[:MAX_PREFIX_TERMS]
+
+    def _term_arrays(self, term):
+        import numpy as np
+
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self.postings[term]
+            arrays = self._arrays[term] = (
+                np.fromiter(map(self.numbers.__getitem__, posting), np.intp, len(posting)),
+                np.fromiter(posting.values(), np.float64, len(posting)))
+        return arrays
+
+    def search(self, query, limit=20):
+        """Best matches as ``(score, data_type, entry)``, highest first."""
+        import numpy as np
+
+        words = tokenize(query)
+        if not words or not self.docs or limit <= 0:
+            return []
+        weights = Counter()
+        for i, word in enumerate(words):
+            for term in self._expand(word) if i == len(words) - 1 else [word]:
+                if term in self.postings:
+                    weights[term] += 1
+        if not weights:
+            return []
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs or 1
+        lengths = np.frombuffer(self.lengths, np.float64)
+        scores = np.zeros(len(lengths))
+        for term, weight in weights.items():
+            numbers, tf = self._term_arrays(term)
+            df = len(numbers)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            # An entry appears once per term, so fancy-index += is safe.
+            scores[numbers] += weight * idf * tf * (K1 + 1) / (
+                tf + K1 * (1 - B + B * lengths[numbers] / avg_length))
+        del lengths  # the array can't grow while a view on it exists
+        if len(scores) > limit:
+            matched = np.argpartition(scores, -limit)[-limit:]
+        else:
+            matched = np.arange(len(scores))
+        matched = matched[scores[matched] > 0]
+        # Best first; ties go to the lower entry number (indexed earlier).
+        matched = matched[np.lexsort((matched, -scores[matched]))]
+        return [(float(scores[n]), self.keys[n][0], self.docs[self.keys[n]]) for n in matched]
+
+    def estimate_size(self):
+        """Rough bytes the index keeps alive, including its entries.
+
+        The entries are usually shared with a cached snapshot, so they are
+        counted twice while both are cached; but after the snapshot is
+        evicted the index alone keeps them, and evicting it frees them.
+        """
+        postings = sum(map(len, self.postings.values()))
+        arrays = sum(len(numbers) for numbers, _ in self._arrays.values())
+        return (120 * postings + 16 * arrays + 460 * len(self.docs) + 90 * len(self.terms)
+                + estimate_entries_size(list(self.docs.values())))
+
+
+def build_index(entries_by_type, version=None):
+    index = UserIndex(version)
+    for data_type in DATA_TYPES:
+        for entry in entries_by_type.get(data_type, []):
+            index.add(data_type, entry, bulk=True)
+    index.terms = sorted(index.postings)
+    for term, posting in index.postings.items():
+        if len(posting) >= PRECOMPUTE_POSTINGS:
+            index._term_arrays(term)
+    return index
+
+
+class IndexRegistry:
+    """LRU of in-memory indexes, shared by every session in the process.
+
+    Given a :class:`storage.cache.MemoryBudget`, indexes also count against
+    the process's memory budget, by their ``estimate_size()`` when added.
+    """
+
+    def __init__(self, max_indexes=MAX_INDEXES, budget=None, name="indexes"):
+        self.max_indexes = max_indexes
+        self.budget = budget
+        self.name = name
+        self._indexes = OrderedDict()
+        self._sizes = {}
+        self._lock = budget.lock if budget else threading.Lock()
+        if budget:
+            budget.register(self)
+
+    def get(self, username):
+        with self._lock:
+            index = self._indexes.get(username)
+            if index is not None:
+                self._indexes.move_to_end(username)
+                if self.budget:
+                    self.budget.touch(self, username)
+            return index
+
+    def put(self, username, index):
+        size = index.estimate_size() if self.budget else 0
+        with self._lock:
+            self._discard(username)
+            self._indexes[username] = index
+            if self.budget:
+                self._sizes[username] = size
+                self.budget.charge(self, username, size)
+            while len(self._indexes) > self.max_indexes:
+                self._discard(next(iter(self._indexes)))
+
+    def discard(self, username):
+        with self._lock:
+            self._discard(username)
+
+    def clear(self):
+        with self._lock:
+            for username in list(self._indexes):
+                self._discard(username)
+
+    def _discard(self, username):
+        if self._indexes.pop(username, None) is not None and self.budget:
+            self._sizes.pop(username, None)
+            self.budget.release(self, username)
+
+    def report(self):
+        """Called by the budget with the lock held."""
+        largest = sorted(self._sizes.items(), key=lambda item: -item[1])[:5]
+        return {'name': self.name, 'items': len(self._indexes),
+                'bytes': sum(self._sizes.values()),
+                'largest': [[str(key), size] for key, size in largest]}
@@ -0,0 +1,107 @@
+"""Move users from the flat ``users/`` layout into sharded directories.
+
+Usage::
+
+    python -m storage.shard [--dry-run] [--grace SECONDS]
+
+Safe to run while the app is serving.  Each user's files are hard-linked
+into a staging directory which is then renamed into place while holding
+all of the user's locks, so readers and writers see either the flat files
+or the sharded directory, never a mix.  The flat copies are only removed
+after every user has moved and ``--grace`` seconds have passed, so a read
+that looked a path up just before its user moved still finds the file.
+Re-running is safe; users already sharded are skipped.
+"""
+import argparse
+import glob
+import os
+import re
+import shutil
+import time
+
+from storage.fileio import user_lock
+from storage.files import AUX_SUFFIXES, legacy_usernames
+from storage.paths import (USERS_DIR, is_legacy, legacy_account_path, legacy_data_path,
+                           user_dir)
+
+AUX_NAMES = tuple(suffix[1:] for suffix in AUX_SUFFIXES)
+_SEGMENT = re.compile(r"data\.journal(\.\d+)?$|archive\.\w+\.\d+\.gz$")
+
+
+def legacy_users():
+    """Every username with files in the flat layout, accounts or not."""
+    names = set(legacy_usernames())
+    for pattern in ("*_data.json", "*_data.journal"):
+        for path in glob.glob(os.path.join(glob.escape(USERS_DIR), pattern)):
+            names.add(os.path.basename(path).rsplit("_data.", 1)[0])
+    return sorted(names)
+
+
+def legacy_files(username):
+    """``(flat path, name in the user directory)`` for each of the user's files."""
+    files = []
+    if os.path.exists(legacy_account_path(username)):
+        files.append((legacy_account_path(username), "account.json"))
+    prefix = legacy_data_path(username, "")
+    for path in glob.glob(glob.escape(prefix) + "*"):
+        suffix = path[len(prefix):]
+        if _SEGMENT.match(suffix) or suffix in [f"{name}.json" for name in AUX_NAMES]:
+            files.append((path, suffix))
+    return files
+
+
+def move_user(username, dry_run=False):
+    """Switch one user to the sharded layout; returns the flat files moved."""
+    with user_lock(username, "account"), user_lock(username, "summary"), user_lock(username):
+        if not is_legacy(username):
+            return []
+        files = legacy_files(username)
+        if dry_run:
+            return files
+        target = user_dir(username)
+        staging = target + ".staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for path, name in files:
+            try:
+                os.link(path, os.path.join(staging, name))
+            except OSError:
+                shutil.copy2(path, os.path.join(staging, name))
+        os.rename(staging, target)
+    return files
+
+
+def remove_flat_copies(files):
+    for path, _ in files:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    # Lock files from the flat layout are no longer used by anything.
+    for path in glob.glob(os.path.join(glob.escape(USERS_DIR), "*.lock")):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="list what would move")
+    parser.add_argument("--grace", type=float, default=5.0,
+                        help="seconds to wait before deleting the flat copies")
+    args = parser.parse_args()
+    moved = []
+    users = 0
+    for username in legacy_users():
+        files = move_user(username, args.dry_run)
+        if files:
+            users += 1
+            moved.extend(files)
+            if args.dry_run:
+                print(f"{username}: {', '.join(os.path.basename(path) for path, _ in files)}")
+    if not args.dry_run and moved:
+        time.sleep(args.grace)
+        remove_flat_copies(moved)
+    print(f"{'Would move' if args.dry_run else 'Moved'} {users} users ({len(moved)} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""SQLite backend.
+
+Accounts and entries live in one database file in WAL mode, with entries
+indexed by ``(username, type, timestamp)`` so a page only reads the rows it
+renders; goals are also indexed by status for the filtered goals list.
+Connections come from a small pool shared by all sessions.  Bodies are
+stored in the compact record form from :mod:`storage.records`.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from storage import codec, records
+from storage.base import StorageBackend
+from storage.journal import empty_user_data
+from storage.paging import bound
+from storage.paths import folded
+
+DEFAULT_PATH = os.environ.get("GROWTH_SQLITE_PATH", "users/growth.db")
+POOL_SIZE = int(os.environ.get("GROWTH_SQLITE_POOL", "4"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    username TEXT PRIMARY KEY,
+    email    TEXT NOT NULL,
+    password TEXT NOT NULL,
+    folded   TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    username  TEXT NOT NULL,
+    type      TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    body      TEXT NOT NULL,
+    entry_id  TEXT,
+    status    TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_user_type_ts
+    ON entries (username, type, timestamp);
+CREATE TABLE IF NOT EXISTS aux (
+    username TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    body     TEXT NOT NULL,
+    PRIMARY KEY (username, name)
+);
+CREATE TABLE IF NOT EXISTS user_versions (
+    username TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL
+);
+"""
+
+# Applied after SCHEMA; each step upgrades databases created by older code.
+UPGRADES = (
+    ("entries", "entry_id", [
+        "ALTER TABLE entries ADD COLUMN entry_id TEXT",
+        "UPDATE entries SET entry_id = 'row-' || id WHERE entry_id IS NULL",
+    ]),
+    ("entries", "status", [
+        "ALTER TABLE entries ADD COLUMN status TEXT",
+        "UPDATE entries SET status = json_extract(body, '$.status') WHERE type = 'goals'",
+    ]),
+    ("accounts", "folded", [
+        "ALTER TABLE accounts ADD COLUMN folded TEXT",
+        "UPDATE accounts SET folded = casefold(username)",
+    ]),
+)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS accounts_folded ON accounts (folded);
+CREATE UNIQUE INDEX IF NOT EXISTS entries_user_entry_id
+    ON entries (username, entry_id);
+CREATE INDEX IF NOT EXISTS entries_user_type_status_ts
+    ON entries (username, type, status, timestamp);
+"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of connections usable from any thread."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._size = size
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        # Python's case folding (SQLite's NOCASE only folds ASCII), for upgrades.
+        conn.create_function("casefold", 1, folded, deterministic=True)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success, rolls back on error."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._size
+                if create:
+                    self._created += 1
+            conn = self._connect() if create else self._idle.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+
+class SqliteBackend(StorageBackend):
+
+    indexed_paging = True
+
+    def __init__(self, path=DEFAULT_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.pool = ConnectionPool(path)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, statements in UPGRADES:
+                columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                if column not in columns:
+                    for statement in statements:
+                        conn.execute(statement)
+            conn.executescript(INDEXES)
+
+    def get_account(self, username):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT username, email, password FROM accounts WHERE username = ?",
+                (username,)).fetchone()
+        if row is None:
+            return None
+        return {'username': row[0], 'email': row[1], 'password': row[2]}
+
+    def save_account(self, account):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO accounts (username, email, password, folded) "
+                "VALUES (?, ?, ?, ?)",
+                (account['username'], account['email'], account['password'],
+                 folded(account['username'])))
+
+    def find_username(self, username):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT username FROM accounts WHERE folded = ? LIMIT 1",
+                               (folded(username),)).fetchone()
+        return row[0] if row else None
+
+    def usernames(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT username FROM accounts ORDER BY username").fetchall()
+        return [row[0] for row in rows]
+
+    def accounts(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT username, email, password FROM accounts").fetchall()
+        for row in rows:
+            yield {'username': row[0], 'email': row[1], 'password': row[2]}
+
+    def add_entry(self, username, data_type, entry):
+        with self.pool.connection() as conn:
+            self._insert(conn, username, data_type, entry)
+
+    def add_entries(self, username, data_type, entries):
+        with self.pool.connection() as conn:
+            for entry in entries:
+                self._insert(conn, username, data_type, entry)
+
+    def _insert(self, conn, username, data_type, entry):
+        if isinstance(entry, dict):
+            # Stored-form dicts (from the write-behind queue or a remote
+            # client) carry ``ts`` rather than a timestamp string.
+            entry = records.from_dict(data_type, entry)
+        conn.execute(
+            "INSERT INTO entries (username, type, timestamp, body, entry_id, status) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (username, data_type, entry.get('timestamp', ''),
+             codec.dumps_str(records.to_dict(data_type, entry)), entry['id'],
+             entry.get('status')))
+        self._bump_version(conn, username)
+
+    def update_entry(self, username, data_type, entry_id, changes):
+        with self.pool.connection() as conn:
+            # Take the write lock before reading so concurrent updates of the
+            # same entry can't lose each other's changes.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT body FROM entries WHERE username = ? AND entry_id = ? AND type = ?",
+                (username, entry_id, data_type)).fetchone()
+            if row is None:
+                return
+            entry = _entry(data_type, entry_id, row[0])
+            entry.update(changes)
+            conn.execute(
+                "UPDATE entries SET body = ?, status = ? WHERE username = ? AND entry_id = ?",
+                (codec.dumps_str(records.to_dict(data_type, entry)), entry.get('status'),
+                 username, entry_id))
+            self._bump_version(conn, username)
+
+    def delete_entry(self, username, data_type, entry_id):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "DELETE FROM entries WHERE username = ? AND entry_id = ? AND type = ?",
+                (username, entry_id, data_type))
+            self._bump_version(conn, username)
+
+    def replace_user_data(self, username, user_data):
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM entries WHERE username = ?", (username,))
+            for data_type, entries in user_data.items():
+                for entry in entries:
+                    self._insert(conn, username, data_type, entry)
+            self._bump_version(conn, username)
+
+    def _bump_version(self, conn, username):
+        conn.execute(
+            "INSERT INTO user_versions (username, version) VALUES (?, 1) "
+            "ON CONFLICT (username) DO UPDATE SET version = version + 1",
+            (username,))
+
+    def delete_user_entries(self, username):
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM entries WHERE username = ?", (username,))
+            self._bump_version(conn, username)
+
+    def page(self, username, data_type, limit, before=None, since=None, until=None,
+             status=None):
+        # Walks entries_user_type_ts (or entries_user_type_status_ts)
+        # backwards; the cursor is the (timestamp, id) of the oldest row
+        # returned.
+        query = ["SELECT timestamp, id, entry_id, body FROM entries "
+                 "WHERE username = ? AND type = ?"]
+        params = [username, data_type]
+        if status is not None:
+            query.append("AND status = ?")
+            params.append(status)
+        if since is not None:
+            query.append("AND timestamp >= ?")
+            params.append(bound(since))
+        if until is not None:
+            query.append("AND timestamp < ?")
+            params.append(bound(until))
+        if before is not None:
+            timestamp, _, row_id = before.rpartition("|")
+            query.append("AND (timestamp, id) < (?, ?)")
+            params.extend([timestamp, int(row_id)])
+        query.append("ORDER BY timestamp DESC, id DESC LIMIT ?")
+        params.append(limit + 1)
+        with self.pool.connection() as conn:
+            rows = conn.execute(" ".join(query), params).fetchall()
+        cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = f"{rows[-1][0]}|{rows[-1][1]}"
+        return [_entry(data_type, entry_id, body) for _, _, entry_id, body in rows], cursor
+
+    def iter_entries(self, username, data_type, chunk_size=10000):
+        # Streams from a cursor so only one chunk of rows is in memory.
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "SELECT entry_id, body FROM entries WHERE username = ? AND type = ? "
+                "ORDER BY timestamp, id", (username, data_type))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [_entry(data_type, entry_id, body) for entry_id, body in rows]
+
+    def load_aux(self, username, name):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT body FROM aux WHERE username = ? AND name = ?", (username, name)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def save_aux(self, username, name, value):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO aux (username, name, body) VALUES (?, ?, ?)",
+                (username, name, codec.dumps_str(value)))
+
+    def version(self, username):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT version FROM user_versions WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, username, data_type=None):
+        with self.pool.connection() as conn:
+            if data_type:
+                rows = conn.execute(
+                    "SELECT entry_id, body FROM entries WHERE username = ? AND type = ? "
+                    "ORDER BY timestamp, id", (username, data_type)).fetchall()
+                return [_entry(data_type, entry_id, body) for entry_id, body in rows]
+            rows = conn.execute(
+                "SELECT type, entry_id, body FROM entries WHERE username = ? "
+                "ORDER BY timestamp, id", (username,)).fetchall()
+        user_data = empty_user_data()
+        for entry_type, entry_id, body in rows:
+            user_data.setdefault(entry_type, []).append(_entry(entry_type, entry_id, body))
+        return user_data
+
+
+def _entry(data_type, entry_id, body):
+    entry = codec.loads(body)
+    entry['id'] = entry_id
+    return records.from_dict(data_type, entry)
@@ -0,0 +1,64 @@
+"""Per-user aggregates kept up to date at write time.
+
+The summary is a small record stored next to the user's entries::
+
+    {"counts": {"goals": 3, ...}, "completed_goals": 1,
+     "per_day": {"2025-02-18": {"goals": 1, "reflections": 2}}, "revision": 4}
+
+so the Achievements tab never has to scan entry bodies.  ``revision`` goes
+up with every change, which lets derived results be cached against it.
+"""
+from collections.abc import Mapping
+
+from storage.journal import DATA_TYPES
+
+
+def empty_summary():
+    return {
+        'counts': {data_type: 0 for data_type in DATA_TYPES},
+        'completed_goals': 0,
+        'per_day': {},
+        'revision': 0
+    }
+
+
+def build_summary(user_data):
+    summary = empty_summary()
+    for data_type, entries in user_data.items():
+        for entry in entries:
+            if isinstance(entry, Mapping):
+                apply_add(summary, data_type, entry)
+    return summary
+
+
+def _is_completed(data_type, entry):
+    return data_type == 'goals' and entry.get('status') == 'Completed'
+
+
+def _bump(summary, data_type, entry, delta):
+    summary['revision'] = summary.get('revision', 0) + 1
+    counts = summary['counts']
+    counts[data_type] = counts.get(data_type, 0) + delta
+    day = entry.get('timestamp', '')[:10]
+    if day:
+        per_type = summary['per_day'].setdefault(day, {})
+        per_type[data_type] = per_type.get(data_type, 0) + delta
+        if per_type[data_type] <= 0:
+            del per_type[data_type]
+            if not per_type:
+                del summary['per_day'][day]
+    if _is_completed(data_type, entry):
+        summary['completed_goals'] += delta
+
+
+def apply_add(summary, data_type, entry):
+    _bump(summary, data_type, entry, 1)
+
+
+def apply_delete(summary, data_type, entry):
+    _bump(summary, data_type, entry, -1)
+
+
+def apply_update(summary, data_type, old, new):
+    summary['revision'] = summary.get('revision', 0) + 1
+    summary['completed_goals'] += _is_completed(data_type, new) - _is_completed(data_type, old)
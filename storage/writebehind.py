@@ -0,0 +1,254 @@
+"""Write-behind wrapper that takes entry writes off the script thread.
+
+With ``GROWTH_DURABILITY`` set to ``batched`` or ``async`` the facade wraps
+its backend in :class:`WriteBehindBackend`.  Entry writes and side-record
+saves go into an in-memory queue and return at once; a worker thread
+writes them to the real backend, one batch per user:
+
+``sync``
+    no queue, every write is on disk before the call returns (default).
+``batched``
+    the worker flushes every ``GROWTH_FLUSH_MS`` milliseconds, so bursts
+    of writes become one backend call per user.
+``async``
+    the worker flushes as soon as it is free, coalescing whatever queued
+    up during the previous flush.
+
+Reads in this process see queued writes (they are replayed on top of what
+the backend returns), so a session always sees what it just saved; other
+processes see them once flushed.  Writes still queued when the process
+dies are lost, which is the trade-off for not waiting on the disk.  The
+queue is flushed on logout and at interpreter exit.  Account writes always
+go straight through.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+import metrics
+from storage import codec, journal, records
+from storage.base import StorageBackend
+
+DURABILITY = os.environ.get("GROWTH_DURABILITY", "sync")
+FLUSH_SECONDS = float(os.environ.get("GROWTH_FLUSH_MS", "200")) / 1000
+MODES = ("sync", "batched", "async")
+
+logger = logging.getLogger("growth.storage")
+
+
+class WriteBehindBackend(StorageBackend):
+
+    def __init__(self, inner, mode=DURABILITY, interval=FLUSH_SECONDS):
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unknown write-behind mode: {mode}")
+        self.inner = inner
+        self.mode = mode
+        self.interval = interval
+        self.indexed_paging = inner.indexed_paging
+        self._cond = threading.Condition()
+        # username -> queued journal-style records, oldest first
+        self._pending = {}
+        # (username, name) -> latest unsaved side record, encoded so later
+        # changes to the caller's copy can't leak into what gets written
+        self._aux = {}
+        # username -> number of writes ever queued; part of version()
+        self._queued = {}
+        # Held while a user's batch is written, and by reads that overlay
+        # the queue, so a read never sees a write both applied and queued.
+        self._user_locks = {}
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+
+    # Accounts are written synchronously.
+
+    def get_account(self, username):
+        return self.inner.get_account(username)
+
+    def save_account(self, account):
+        self.inner.save_account(account)
+
+    def account_exists(self, username):
+        return self.inner.account_exists(username)
+
+    def find_username(self, username):
+        return self.inner.find_username(username)
+
+    def usernames(self):
+        return self.inner.usernames()
+
+    def accounts(self):
+        return self.inner.accounts()
+
+    # Queued writes
+
+    def add_entry(self, username, data_type, entry):
+        self.add_entries(username, data_type, [entry])
+
+    def add_entries(self, username, data_type, entries):
+        self._enqueue(username, [{'op': 'add', 'type': data_type,
+                                  'entry': records.to_dict(data_type, entry)}
+                                 for entry in entries])
+
+    def update_entry(self, username, data_type, entry_id, changes):
+        self._enqueue(username, [{'op': 'update', 'type': data_type, 'id': entry_id,
+                                  'changes': changes}])
+
+    def delete_entry(self, username, data_type, entry_id):
+        self._enqueue(username, [{'op': 'delete', 'type': data_type, 'id': entry_id}])
+
+    def save_aux(self, username, name, value):
+        with self._cond:
+            self._aux[(username, name)] = codec.dumps(value)
+            self._queued[username] = self._queued.get(username, 0) + 1
+            self._cond.notify()
+
+    def replace_user_data(self, username, user_data):
+        self.flush(username)
+        self.inner.replace_user_data(username, user_data)
+
+    def _enqueue(self, username, batch):
+        with self._cond:
+            self._pending.setdefault(username, []).extend(batch)
+            self._queued[username] = self._queued.get(username, 0) + len(batch)
+            self._cond.notify()
+
+    # Reads overlay the queue
+
+    def _user_lock(self, username):
+        with self._cond:
+            return self._user_locks.setdefault(username, threading.Lock())
+
+    def load(self, username, data_type=None):
+        return self._overlay(self.inner.load, username, data_type)
+
+    def load_history(self, username, data_type=None):
+        return self._overlay(self.inner.load_history, username, data_type)
+
+    def _overlay(self, load, username, data_type):
+        if username not in self._pending:
+            return load(username, data_type)
+        with self._user_lock(username):
+            with self._cond:
+                batch = list(self._pending.get(username, ()))
+            if data_type:
+                batch = [record for record in batch if record['type'] == data_type]
+                return journal.apply_records(
+                    {data_type: load(username, data_type)}, batch)[data_type]
+            return journal.apply_records(load(username), batch)
+
+    def has_archive(self, username, data_type):
+        return self.inner.has_archive(username, data_type)
+
+    def lock(self, username, name="data"):
+        return self.inner.lock(username, name)
+
+    def prefetch(self, username):
+        self.inner.prefetch(username)
+
+    def iter_entries(self, username, data_type, chunk_size=10000):
+        if username in self._pending:
+            return super().iter_entries(username, data_type, chunk_size)
+        return self.inner.iter_entries(username, data_type, chunk_size)
+
+    def page(self, username, data_type, limit, before=None, since=None, until=None,
+             status=None):
+        # Index cursors come from the backend, so queued writes for this
+        # user are flushed first rather than merged in.
+        if username in self._pending:
+            self.flush(username)
+        return self.inner.page(username, data_type, limit, before, since, until, status)
+
+    def load_aux(self, username, name):
+        with self._cond:
+            encoded = self._aux.get((username, name))
+        if encoded is not None:
+            return codec.loads(encoded)
+        return self.inner.load_aux(username, name)
+
+    def version(self, username):
+        version = self.inner.version(username)
+        if version is None:
+            return None
+        return (version, self._queued.get(username, 0))
+
+    # Flushing
+
+    def flush(self, username=None):
+        """Write queued changes (one user's, or everyone's) to the backend."""
+        with self._cond:
+            usernames = [username] if username else \
+                list(set(self._pending) | {user for user, _ in self._aux})
+        for user in usernames:
+            self._flush_user(user)
+
+    def _flush_user(self, username):
+        with self._user_lock(username):
+            with self._cond:
+                batch = list(self._pending.get(username, ()))
+                aux = {key: value for key, value in self._aux.items() if key[0] == username}
+            if not batch and not aux:
+                return
+            written = 0
+            try:
+                with metrics.timed("storage.write_behind_flush"):
+                    for count in self._write(username, batch, aux):
+                        written += count
+            finally:
+                # Drop exactly what reached the backend, so a failed flush is
+                # retried from the first unwritten record.
+                with self._cond:
+                    pending = self._pending.get(username, [])
+                    del pending[:min(written, len(batch))]
+                    if not pending:
+                        self._pending.pop(username, None)
+                    if written > len(batch):
+                        for key, value in aux.items():
+                            # A newer value queued meanwhile stays for the next flush.
+                            if self._aux.get(key) is value:
+                                del self._aux[key]
+
+    def _write(self, username, batch, aux):
+        """Write ``batch`` in as few backend calls as possible.
+
+        Yields the number of records each call wrote; the side records
+        count as one extra at the end.
+        """
+        start = 0
+        while start < len(batch):
+            record = batch[start]
+            if record['op'] == 'add':
+                end = start + 1
+                while end < len(batch) and batch[end]['op'] == 'add' \
+                        and batch[end]['type'] == record['type']:
+                    end += 1
+                self.inner.add_entries(username, record['type'],
+                                       [add['entry'] for add in batch[start:end]])
+            else:
+                end = start + 1
+                if record['op'] == 'update':
+                    self.inner.update_entry(username, record['type'], record['id'],
+                                            record['changes'])
+                else:
+                    self.inner.delete_entry(username, record['type'], record['id'])
+            yield end - start
+            start = end
+        for (_, name), encoded in aux.items():
+            self.inner.save_aux(username, name, codec.loads(encoded))
+        yield 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._aux:
+                    self._cond.wait()
+            if self.mode == "batched":
+                time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                # Leave the queue as it is and retry; reads keep seeing it.
+                logger.exception("write-behind flush failed")
+                time.sleep(max(self.interval, 1.0))
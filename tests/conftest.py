@@ -0,0 +1,16 @@
+"""Point storage at a throwaway users/ directory before it is imported."""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+os.environ["GROWTH_USERS_DIR"] = tempfile.mkdtemp(prefix="growth-tests-")
+os.environ["GROWTH_STORAGE"] = "files"
+os.environ["GROWTH_DURABILITY"] = "sync"
+
+
+@pytest.fixture
+def username():
+    """A user of its own for each test."""
+    return f"user-{uuid.uuid4().hex[:12]}"
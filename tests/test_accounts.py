@@ -0,0 +1,51 @@
+"""Password hashing, legacy password upgrades and unique usernames."""
+import pytest
+
+import storage
+from storage import accounts
+from storage.files import FileBackend
+from storage.sqlite import SqliteBackend
+
+
+def test_hash_round_trip():
+    stored = accounts.hash_password("hunter2")
+    assert accounts.is_hashed(stored)
+    assert "hunter2" not in stored
+    assert accounts.verify_password("hunter2", stored)
+    assert not accounts.verify_password("hunter3", stored)
+    assert accounts.hash_password("hunter2") != stored  # salted
+
+
+def test_plaintext_password_is_hashed_on_login(username):
+    storage.get_backend().save_account(
+        {'username': username, 'email': 'a@example.com', 'password': "secret"})
+    assert not storage.verify_login(username, "wrong")
+    assert not accounts.is_hashed(storage.get_backend().get_account(username)['password'])
+
+    assert storage.verify_login(username, "secret")
+    stored = storage.get_backend().get_account(username)['password']
+    assert accounts.is_hashed(stored)
+    assert storage.verify_login(username, "secret")
+
+
+def test_usernames_are_unique_ignoring_case(username):
+    assert storage.create_account(username, 'a@example.com', "pw")
+    assert not storage.create_account(username.upper(), 'b@example.com', "pw")
+    assert storage.get_backend().get_account(username.upper()) is None
+
+
+@pytest.fixture(params=["files", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "files":
+        return FileBackend()
+    return SqliteBackend(str(tmp_path / "growth.db"))
+
+
+def test_sign_up_sees_accounts_created_elsewhere(backend, username):
+    # Two processes' indexes, both loaded before either sign-up.
+    first, second = accounts.AccountIndex(backend), accounts.AccountIndex(backend)
+    first.get("nobody"), second.get("nobody")
+    assert first.create({'username': username.title(), 'email': '', 'password': "x"})
+    assert backend.find_username(username.upper()) == username.title()
+    assert not second.create({'username': username.upper(), 'email': '', 'password': "x"})
+    assert second.get(username.title())['username'] == username.title()
@@ -0,0 +1,47 @@
+"""Archiving old entries and reaching them again."""
+import storage
+from storage import archive, journal
+
+
+def test_update_and_delete_of_archived_entries(username, monkeypatch):
+    monkeypatch.setattr(archive, "MIN_SEGMENT", 3)
+    storage.add_entries(username, 'reflections', [
+        {'reflection': f"old {i}", 'challenges': '', 'solutions': '',
+         'timestamp': f"2020-01-0{i + 1} 10:00:00"} for i in range(5)])
+    storage.save_user_data(username, 'reflections',
+                           {'reflection': "new", 'challenges': '', 'solutions': ''})
+    journal.compact(username)
+    assert journal.has_archive(username, 'reflections')
+    assert [r['reflection'] for r in storage.load_user_data(username, 'reflections')] == ["new"]
+
+    ids = {r['reflection']: r['id'] for r in storage.load_history(username, 'reflections')}
+    storage.update_entry(username, 'reflections', ids["old 1"], {'reflection': "old 1 edited"})
+    storage.delete_entry(username, 'reflections', ids["old 2"])
+    expected = ["old 0", "old 1 edited", "old 3", "old 4", "new"]
+    assert [r['reflection'] for r in storage.load_history(username, 'reflections')] == expected
+
+    # The changes survive the next compaction.
+    storage.save_user_data(username, 'reflections',
+                           {'reflection': "newer", 'challenges': '', 'solutions': ''})
+    journal.compact(username)
+    history = journal.load_history(username, 'reflections')['reflections']
+    assert [r['reflection'] for r in history] == expected + ["newer"]
+
+
+def test_paging_continues_into_the_archive(username, monkeypatch):
+    monkeypatch.setattr(archive, "MIN_SEGMENT", 3)
+    storage.add_entries(username, 'mistakes', [
+        {'mistake': f"old {i}", 'learning': '', 'timestamp': f"2020-02-0{i + 1} 10:00:00"}
+        for i in range(4)])
+    storage.save_user_data(username, 'mistakes', {'mistake': "new", 'learning': ''})
+    journal.compact(username)
+    assert journal.has_archive(username, 'mistakes')
+    assert archive.segments_on_disk(username, 'mistakes')
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = storage.load_entries_page(username, 'mistakes', 2, before=cursor)
+        seen.extend(m['mistake'] for m in page)
+        if cursor is None:
+            break
+    assert seen == ["new", "old 3", "old 2", "old 1", "old 0"]
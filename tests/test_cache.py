@@ -0,0 +1,64 @@
+"""Shared snapshots and the memory budget they are charged to."""
+import pytest
+
+from storage.cache import MemoryBudget, Snapshot, UserDataCache
+from storage.search import IndexRegistry, build_index
+
+
+def user_data(n):
+    return {'goals': [{'id': str(i), 'goal': "x" * 100} for i in range(n)]}
+
+
+def test_snapshots_are_read_only():
+    snapshot = Snapshot(user_data(2), version=1)
+    assert isinstance(snapshot['goals'], tuple)
+    for change in (lambda: snapshot.__setitem__('goals', []), lambda: snapshot.pop('goals'),
+                   lambda: snapshot.update({}), snapshot.clear):
+        with pytest.raises(TypeError):
+            change()
+    copy = snapshot.thaw()
+    copy['goals'].append({'id': "new"})
+    assert len(snapshot['goals']) == 2
+
+
+def test_cached_only_while_the_version_matches():
+    cache = UserDataCache(MemoryBudget(10 ** 6))
+    snapshot = cache.put("alice", 1, user_data(2))
+    assert cache.get("alice", 1) is snapshot
+    assert cache.get("alice", 2) is None
+    assert cache.get("alice", None) is None
+
+
+def test_budget_evicts_least_recently_used_across_caches():
+    budget = MemoryBudget(10 ** 9)
+    users, history = UserDataCache(budget, "user data"), UserDataCache(budget, "history")
+    one = users.put("a", 1, user_data(20)).nbytes
+    budget.max_bytes = int(one * 2.5)
+    history.put("b", 1, user_data(20))
+    users.get("a", 1)  # "a" is now more recent than "b"
+    users.put("c", 1, user_data(20))
+
+    assert budget.size <= budget.max_bytes
+    assert budget.evictions == 1
+    assert history.report()['items'] == 0
+    assert users.report()['items'] == 2
+
+
+def test_evicted_snapshot_still_held_is_reused():
+    budget = MemoryBudget(10 ** 9)
+    cache = UserDataCache(budget)
+    held = cache.put("a", 1, user_data(5))
+    budget.max_bytes = held.nbytes
+    cache.put("b", 1, user_data(5))  # evicts "a"
+    assert cache.report()['evicted_in_use'] == 1
+    assert cache.get("a", 1) is held
+
+
+def test_indexes_are_charged_to_the_budget():
+    budget = MemoryBudget(10 ** 9)
+    registry = IndexRegistry(budget=budget)
+    index = build_index({'goals': user_data(50)['goals']})
+    registry.put("a", index)
+    assert budget.size == index.estimate_size() > 0
+    registry.discard("a")
+    assert budget.size == 0
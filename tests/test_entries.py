@@ -0,0 +1,62 @@
+"""Repairing damaged entry lists and migrating them to SQLite."""
+import json
+
+from storage.entries import assign_missing_ids, flatten_entries
+from storage.files import FileBackend
+from storage.migrate import migrate
+from storage.paths import data_path, ensure_user_dir
+from storage.repair import repair_user
+from storage.sqlite import SqliteBackend
+
+
+def goal(text, status='In Progress', timestamp="2024-01-01 10:00:00"):
+    return {'goal': text, 'status': status, 'timestamp': timestamp}
+
+
+def damaged_user(username):
+    """A user hit by the old "Complete" handler, plus two identical goals
+    saved in the same second (so they get the same legacy ID)."""
+    FileBackend().save_account({'username': username, 'email': '', 'password': "x"})
+    ensure_user_dir(username)
+    goals = [goal("a"), [goal("a", 'Completed'), goal("b")],
+             goal("c", timestamp="2024-01-02 10:00:00"),
+             goal("c", timestamp="2024-01-02 10:00:00")]
+    with open(data_path(username, "data.json"), "w") as f:
+        json.dump({'goals': goals}, f)
+
+
+def test_flatten_merges_copies_and_keeps_first_position():
+    flat = flatten_entries([goal("a"), [goal("a", 'Completed'), goal("b")], "junk"])
+    assert [(g['goal'], g['status']) for g in flat] == [("a", 'Completed'), ("b", 'In Progress')]
+
+
+def test_legacy_ids_are_stable():
+    first, second = {'goals': [goal("a")]}, {'goals': [goal("a")]}
+    assert assign_missing_ids(first) and assign_missing_ids(second)
+    assert first['goals'][0]['id'] == second['goals'][0]['id']
+    assert first['goals'][0]['id'].startswith("legacy-")
+    assert not assign_missing_ids(first)
+
+
+def test_repair_user(username):
+    damaged_user(username)
+    backend = FileBackend()
+    assert repair_user(backend, username)
+    goals = backend.load(username, 'goals')
+    assert [(g['goal'], g['status']) for g in goals] == [
+        ("a", 'Completed'), ("b", 'In Progress'), ("c", 'In Progress')]
+    assert len({g['id'] for g in goals}) == 3
+    assert not repair_user(backend, username)
+
+
+def test_migrate_repairs_damaged_lists(username, tmp_path):
+    damaged_user(username)
+    source, target = FileBackend(), SqliteBackend(str(tmp_path / "growth.db"))
+    source.usernames = lambda: [username]
+    assert migrate(source, target) == 1
+    goals = target.load(username, 'goals')
+    assert [(g['goal'], g['status']) for g in goals] == [
+        ("a", 'Completed'), ("b", 'In Progress'), ("c", 'In Progress')]
+    # Re-running replaces rather than duplicates.
+    migrate(source, target)
+    assert len(target.load(username, 'goals')) == 3
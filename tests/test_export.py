@@ -0,0 +1,50 @@
+"""Exporting and re-importing entries."""
+import io
+
+import pytest
+
+import storage
+from storage.export import export_entries, import_entries
+
+
+def reflection(text, **fields):
+    return {'reflection': text, 'challenges': '', 'solutions': '', **fields}
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_round_trip(username, fmt):
+    storage.save_user_data(username, 'goals', {'goal': "ship", 'status': 'Completed'})
+    storage.save_user_data(username, 'reflections', reflection("good day"))
+    out = io.BytesIO()
+    assert export_entries(out, storage.get_backend(), [username], fmt) == 2
+
+    out.seek(0)
+    copy = username + "-copy"
+    assert import_entries(out, fmt, copy) == (2, 0)
+    for data_type in ('goals', 'reflections'):
+        original = storage.load_user_data(username, data_type)
+        imported = storage.load_user_data(copy, data_type)
+        assert [dict(entry) for entry in imported] == [dict(entry) for entry in original]
+
+    # Importing the same file again adds nothing.
+    out.seek(0)
+    assert import_entries(out, fmt, copy) == (0, 0)
+
+
+def test_rejects_bad_timestamps_and_skips_achievements(username):
+    rows = ("username,type,id,timestamp,reflection\n"
+            f"{username},reflections,r1,2024-01-01 10:00:00,fine\n"
+            f"{username},reflections,r2,yesterday,bad\n"
+            f"{username},achievements,a1,2024-01-01 10:00:00,\n")
+    assert import_entries(io.StringIO(rows), 'csv') == (1, 1)
+    assert [r['reflection'] for r in storage.load_user_data(username, 'reflections')] == ["fine"]
+
+
+def test_ids_repeated_within_a_file_are_imported_once(username):
+    # Two users in an all-users export can share an id.
+    rows = ("username,type,id,timestamp,reflection\n"
+            "alice,reflections,same,2024-01-01 10:00:00,from alice\n"
+            "bob,reflections,same,2024-01-02 10:00:00,from bob\n")
+    assert import_entries(io.StringIO(rows), 'csv', username) == (1, 0)
+    assert [r['reflection'] for r in storage.load_user_data(username, 'reflections')] == [
+        "from alice"]
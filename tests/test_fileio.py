@@ -0,0 +1,52 @@
+"""Atomic writes, damaged files and group commit."""
+import threading
+
+import pytest
+
+from storage.fileio import CorruptDataError, GroupCommit, atomic_write_json, read_json
+
+
+def test_atomic_write_and_damaged_files(tmp_path):
+    path = str(tmp_path / "data.json")
+    assert read_json(path, default={}) == {}
+    atomic_write_json(path, {'goals': [1, 2]})
+    assert read_json(path) == {'goals': [1, 2]}
+    assert not [name for name in tmp_path.iterdir() if name.name != "data.json"]
+
+    with open(path, "w") as f:
+        f.write('{"goals": [1,')
+    with pytest.raises(CorruptDataError):
+        read_json(path)
+
+
+def test_group_commit_batches_concurrent_submits():
+    batches = []
+    commit = GroupCommit(lambda items: batches.append(list(items)), window=0.05)
+    threads = [threading.Thread(target=commit.submit, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(item for batch in batches for item in batch) == list(range(8))
+    assert len(batches) < 8
+
+
+def test_group_commit_reports_errors_to_every_submitter():
+    def fail(items):
+        raise OSError("disk full")
+
+    commit = GroupCommit(fail, window=0.05)
+    errors = []
+
+    def submit(item):
+        try:
+            commit.submit(item)
+        except OSError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 4
@@ -0,0 +1,88 @@
+"""Journal replay, damaged journals and compaction."""
+import threading
+import time
+
+import pytest
+
+import storage
+from storage import journal
+from storage.fileio import CorruptDataError
+
+
+def goal(text, **fields):
+    return {'goal': text, 'status': 'In Progress', **fields}
+
+
+def goals(user_data):
+    return [entry['goal'] for entry in user_data['goals']]
+
+
+def test_replay_applies_updates_and_deletes_across_compaction(username):
+    ids = [storage.save_user_data(username, 'goals', goal(f"g{i}")) for i in range(3)]
+    storage.update_entry(username, 'goals', ids[0], {'status': 'Completed'})
+    journal.compact(username)
+    storage.delete_entry(username, 'goals', ids[1])
+
+    user_data = journal.load(username)
+    assert goals(user_data) == ["g0", "g2"]
+    assert [entry['status'] for entry in user_data['goals']] == ['Completed', 'In Progress']
+    assert [entry['id'] for entry in user_data['goals']] == [ids[0], ids[2]]
+
+
+def test_torn_final_line_is_ignored_then_truncated(username):
+    for i in range(3):
+        storage.save_user_data(username, 'goals', goal(f"g{i}"))
+    with open(journal._journal_path(username), "ab") as f:
+        f.write(b'{"op":"add","type":"go')
+    assert goals(journal.load(username)) == ["g0", "g1", "g2"]
+
+    # As after a restart: the next append first cuts the torn line off.
+    journal._tail_lengths.pop(username, None)
+    storage.save_user_data(username, 'goals', goal("g3"))
+    assert goals(journal.load(username)) == ["g0", "g1", "g2", "g3"]
+
+
+def test_damaged_line_before_the_end_is_an_error(username):
+    storage.save_user_data(username, 'goals', goal("g0"))
+    with open(journal._journal_path(username), "ab") as f:
+        f.write(b'not json\n')
+    journal._tail_lengths.pop(username, None)
+    with open(journal._journal_path(username), "ab") as f:
+        f.write(b'{"op":"delete","type":"goals","id":"x"}\n')
+    with pytest.raises(CorruptDataError):
+        journal.load(username)
+
+
+def test_compaction_during_concurrent_saves_loses_nothing(username, monkeypatch):
+    monkeypatch.setattr(journal, "COMPACT_EVERY", 10)
+    done = threading.Event()
+
+    def save(worker):
+        for i in range(50):
+            storage.save_user_data(username, 'goals', goal(f"{worker}-{i}"))
+
+    errors = []
+
+    def compact():
+        while not done.is_set():
+            try:
+                journal.compact(username)
+            except Exception as error:
+                errors.append(error)
+
+    compactor = threading.Thread(target=compact)
+    compactor.start()
+    writers = [threading.Thread(target=save, args=(worker,)) for worker in range(4)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    compactor.join()
+    while username in journal._compacting:
+        time.sleep(0.01)
+
+    assert errors == []
+    saved = goals(journal.load(username))
+    assert sorted(saved) == sorted(f"{worker}-{i}" for worker in range(4) for i in range(50))
+    assert storage.get_summary(username)['counts']['goals'] == 200
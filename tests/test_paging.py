@@ -0,0 +1,68 @@
+"""Paging through entries with cursors, date bounds and status filters."""
+from datetime import date
+
+import pytest
+
+import storage
+from storage.sqlite import SqliteBackend
+
+
+@pytest.fixture(params=["files", "sqlite"])
+def backend(request, tmp_path):
+    """Page through the facade with each backend (files page from the cache,
+    SQLite with its own index)."""
+    original = storage.get_backend()
+    if request.param == "sqlite":
+        storage.use_backend(SqliteBackend(str(tmp_path / "growth.db")))
+    yield request.param
+    storage.use_backend(original)
+
+
+def add_reflections(username, days):
+    storage.add_entries(username, 'reflections', [
+        {'reflection': f"day {day}", 'challenges': '', 'solutions': '',
+         'timestamp': f"2024-01-{day:02d} 10:00:00"} for day in days])
+
+
+def all_pages(username, data_type, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page, cursor = storage.load_entries_page(username, data_type, 5, before=cursor, **kwargs)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_walks_back_through_history(backend, username):
+    add_reflections(username, range(1, 13))
+    pages = all_pages(username, 'reflections')
+    assert [[r['reflection'] for r in page] for page in pages] == [
+        [f"day {day}" for day in range(12, 7, -1)],
+        [f"day {day}" for day in range(7, 2, -1)],
+        ["day 2", "day 1"]]
+
+
+def test_date_bounds(backend, username):
+    add_reflections(username, range(1, 13))
+    page, cursor = storage.load_entries_page(username, 'reflections', 5,
+                                             since=date(2024, 1, 3), until=date(2024, 1, 6))
+    assert [r['reflection'] for r in page] == ["day 5", "day 4", "day 3"]
+    assert cursor is None
+
+
+def test_status_filter_follows_updates(backend, username):
+    storage.add_entries(username, 'goals', [
+        {'goal': f"g{i}", 'status': 'Completed' if i % 3 == 0 else 'In Progress',
+         'timestamp': f"2024-02-{i + 1:02d} 10:00:00"} for i in range(12)])
+    done = all_pages(username, 'goals', status='Completed')
+    assert [[g['goal'] for g in page] for page in done] == [["g9", "g6", "g3", "g0"]]
+
+    in_progress = all_pages(username, 'goals', status='In Progress')
+    assert [len(page) for page in in_progress] == [5, 3]
+    assert all(g['status'] == 'In Progress' for page in in_progress for g in page)
+
+    g1 = next(g for g in in_progress[-1] if g['goal'] == "g1")
+    storage.update_entry(username, 'goals', g1['id'], {'status': 'Completed'})
+    page, _ = storage.load_entries_page(username, 'goals', 5, status='Completed')
+    assert [g['goal'] for g in page] == ["g9", "g6", "g3", "g1", "g0"]
+    assert storage.load_entries_page(username, 'goals', 5, status='Dropped') == ([], None)
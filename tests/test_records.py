@@ -0,0 +1,46 @@
+"""Typed records and reading entries stored in the old format."""
+import json
+
+import pytest
+
+from storage import codec, records
+from storage.files import FileBackend
+from storage.paths import data_path, ensure_user_dir
+
+
+def test_old_format_entry_becomes_a_record():
+    old = {'id': "a", 'timestamp': "2024-01-01 10:00:00", 'goal': "ship",
+           'status': 'Completed', 'priority': "high"}
+    record = records.from_dict('goals', old)
+    assert isinstance(record, records.Goal)
+    assert record.ts == records.parse_timestamp("2024-01-01 10:00:00")
+    assert dict(record) == old
+    with pytest.raises(KeyError):
+        record['missing']
+
+    stored = record.to_dict()
+    assert 'timestamp' not in stored and stored['ts'] == record.ts
+    assert stored['priority'] == "high"
+    assert dict(records.from_dict('goals', stored)) == old
+
+
+def test_types_without_records_stay_as_they_are():
+    assert records.from_dict('achievements', {'x': 1}) == {'x': 1}
+    assert records.from_dict('goals', ["not", "an", "entry"]) == ["not", "an", "entry"]
+
+
+def test_old_format_files_load_as_records(username):
+    ensure_user_dir(username)
+    with open(data_path(username, "data.json"), "w") as f:
+        json.dump({'reflections': [{'reflection': "r", 'challenges': "c", 'solutions': "s",
+                                    'timestamp': "2023-05-06 07:08:09"}]}, f)
+    [entry] = FileBackend().load(username, 'reflections')
+    assert isinstance(entry, records.Reflection)
+    assert entry['timestamp'] == "2023-05-06 07:08:09"
+    assert entry['id'].startswith("legacy-")
+
+
+def test_codec_output_is_plain_json():
+    value = {'goal': "ünïcode", 'ts': 1700000000, 'nested': [1, 2.5, None]}
+    assert json.loads(codec.dumps(value)) == value
+    assert codec.loads(json.dumps(value).encode("utf-8")) == value
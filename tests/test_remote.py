@@ -0,0 +1,75 @@
+"""Locks held through the storage server."""
+import threading
+
+import pytest
+
+from storage.files import FileBackend
+from storage.remote import RemoteBackend, RemoteError, StorageServer, _Connection
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def server():
+    server = StorageServer(("127.0.0.1", 0), FileBackend(), TOKEN)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server, token=TOKEN):
+    host, port = server.server_address
+    return RemoteBackend(f"{host}:{port}", token=token, cache_seconds=0)
+
+
+def lock_in_thread(backend, username):
+    """Take the lock on another thread; the event is set once it has it."""
+    acquired = threading.Event()
+
+    def take():
+        with backend.lock(username, "summary"):
+            acquired.set()
+
+    thread = threading.Thread(target=take, daemon=True)
+    thread.start()
+    return acquired, thread
+
+
+def test_lock_excludes_other_clients(server, username):
+    with client(server).lock(username, "summary"):
+        acquired, thread = lock_in_thread(client(server), username)
+        assert not acquired.wait(0.3)
+    assert acquired.wait(5)
+    thread.join()
+
+
+def test_lock_is_released_when_the_connection_drops(server, username):
+    conn = _Connection(server.server_address, TOKEN, 5)
+    conn.request([["lock", [username, "summary"]]])
+    acquired, thread = lock_in_thread(client(server), username)
+    assert not acquired.wait(0.3)
+    conn.close()
+    assert acquired.wait(5)
+    thread.join()
+
+
+def test_wrong_token_is_refused(server, username):
+    with pytest.raises(RemoteError):
+        client(server, token="wrong").load(username)
+
+
+def test_locked_read_sees_other_replicas_writes(server, username):
+    # Long TTL, so without the lock bypass replica A would read its stale copy.
+    host, port = server.server_address
+    a, b = (RemoteBackend(f"{host}:{port}", token=TOKEN, cache_seconds=60) for _ in range(2))
+    b.save_aux(username, 'summary', {'count': 0})
+    a.prefetch(username)
+
+    for replica in (b, a):
+        with replica.lock(username, "summary"):
+            summary = replica.load_aux(username, 'summary')
+            summary['count'] += 1
+            replica.save_aux(username, 'summary', summary)
+    assert b.load_aux(username, 'summary') == {'count': 2}
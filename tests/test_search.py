@@ -0,0 +1,54 @@
+"""Ranked and prefix search, and keeping indexes current."""
+import storage
+from storage.search import build_index
+
+
+def reflection(entry_id, text):
+    return {'id': entry_id, 'reflection': text, 'challenges': '', 'solutions': ''}
+
+
+def ids(results):
+    return [entry['id'] for _, _, entry in results]
+
+
+def test_ranking_prefers_frequent_terms_in_short_entries():
+    index = build_index({'reflections': [
+        reflection("long", "python " + "filler " * 30),
+        reflection("short", "python"),
+        reflection("once", "python and more words here"),
+        reflection("twice", "python python and more words"),
+        reflection("none", "nothing relevant"),
+    ]})
+    results = ids(index.search("python"))
+    assert set(results) == {"long", "short", "once", "twice"}
+    assert results.index("short") < results.index("long")
+    assert results.index("twice") < results.index("once")
+    assert ids(index.search("python", limit=1)) == results[:1]
+    assert index.search("absent") == []
+
+
+def test_last_word_matches_as_a_prefix():
+    index = build_index({'reflections': [reflection("a", "learning pandas"),
+                                         reflection("b", "learned numpy"),
+                                         reflection("c", "learn")]})
+    assert set(ids(index.search("lear"))) == {"a", "b", "c"}
+    assert ids(index.search("pand")) == ["a"]
+    # Only the last word is a prefix.
+    assert ids(index.search("lear zzz")) == []
+    assert ids(index.search("learned num")) == ["b"]
+
+
+def test_index_follows_adds_updates_and_deletes(username):
+    storage.save_user_data(username, 'mistakes', {'mistake': "forgot tests", 'learning': ''})
+    assert len(storage.search_entries(username, "tests")) == 1
+
+    entry_id = storage.save_user_data(username, 'goals',
+                                      {'goal': "write more tests", 'status': 'In Progress'})
+    assert {data_type for data_type, _ in storage.search_entries(username, "tests")} == {
+        'goals', 'mistakes'}
+    storage.update_entry(username, 'goals', entry_id, {'goal': "write docs"})
+    assert [data_type for data_type, _ in storage.search_entries(username, "tests")] == [
+        'mistakes']
+    assert len(storage.search_entries(username, "docs")) == 1
+    storage.delete_entry(username, 'goals', entry_id)
+    assert storage.search_entries(username, "docs") == []
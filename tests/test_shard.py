@@ -0,0 +1,37 @@
+"""Moving users from the flat layout into sharded directories."""
+import json
+import os
+
+import storage
+from storage import shard
+from storage.files import FileBackend
+from storage.paths import is_legacy, legacy_account_path, legacy_data_path, user_dir
+
+
+def flat_user(username):
+    with open(legacy_account_path(username), "w") as f:
+        json.dump({'username': username, 'email': '', 'password': "x"}, f)
+    with open(legacy_data_path(username, "data.json"), "w") as f:
+        json.dump({'goals': [{'id': "g1", 'goal': "flat", 'status': 'In Progress',
+                              'timestamp': "2024-01-01 10:00:00"}]}, f)
+
+
+def test_move_user(username):
+    flat_user(username)
+    backend = FileBackend()
+    assert is_legacy(username) and username in shard.legacy_users()
+    assert [g['goal'] for g in backend.load(username, 'goals')] == ["flat"]
+
+    assert len(shard.move_user(username, dry_run=True)) == 2
+    assert is_legacy(username)
+
+    moved = shard.move_user(username)
+    assert sorted(name for _, name in moved) == ["account.json", "data.json"]
+    assert not is_legacy(username) and os.path.isdir(user_dir(username))
+    assert shard.move_user(username) == []
+
+    shard.remove_flat_copies(moved)
+    assert not os.path.exists(legacy_account_path(username))
+    assert backend.get_account(username)['username'] == username
+    storage.save_user_data(username, 'goals', {'goal': "sharded", 'status': 'In Progress'})
+    assert [g['goal'] for g in backend.load(username, 'goals')] == ["flat", "sharded"]
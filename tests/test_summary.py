@@ -0,0 +1,34 @@
+"""Summaries maintained at write time match a rebuild from history."""
+import storage
+from storage.summary import build_summary
+
+
+def without_revision(summary):
+    return {key: value for key, value in summary.items() if key != 'revision'}
+
+
+def test_deltas_match_a_rebuild(username):
+    ids = [storage.save_user_data(username, 'goals', {'goal': f"g{i}", 'status': 'In Progress'})
+           for i in range(3)]
+    storage.save_user_data(username, 'mistakes', {'mistake': "m", 'learning': "l"})
+    storage.add_entries(username, 'reflections', [
+        {'reflection': "old", 'challenges': '', 'solutions': '',
+         'timestamp': "2024-03-01 09:00:00"}])
+    storage.update_entry(username, 'goals', ids[0], {'status': 'Completed'})
+    storage.update_entry(username, 'goals', ids[1], {'status': 'Completed'})
+    storage.update_entry(username, 'goals', ids[1], {'status': 'In Progress'})
+    storage.delete_entry(username, 'goals', ids[2])
+
+    summary = storage.get_summary(username)
+    assert summary['counts']['goals'] == 2
+    assert summary['completed_goals'] == 1
+    assert summary['per_day']["2024-03-01"] == {'reflections': 1}
+    rebuilt = build_summary(storage.get_backend().load_history(username))
+    assert without_revision(summary) == without_revision(rebuilt)
+
+
+def test_revision_goes_up_with_every_change(username):
+    before = storage.get_summary(username)['revision']
+    entry_id = storage.save_user_data(username, 'goals', {'goal': "g", 'status': 'In Progress'})
+    storage.update_entry(username, 'goals', entry_id, {'status': 'Completed'})
+    assert storage.get_summary(username)['revision'] == before + 2
@@ -0,0 +1,53 @@
+"""Queued writes: reads see them at once, failed flushes are retried."""
+import pytest
+
+from storage.files import FileBackend
+from storage.writebehind import WriteBehindBackend
+
+
+def goal(text, **fields):
+    return {'goal': text, 'status': 'In Progress', **fields}
+
+
+def test_reads_overlay_queued_writes(username):
+    inner = FileBackend()
+    backend = WriteBehindBackend(inner, mode="batched", interval=3600)
+    version = backend.version(username)
+    backend.add_entry(username, 'goals', goal("a", id="a", timestamp="2024-01-01 10:00:00"))
+    backend.update_entry(username, 'goals', "a", {'status': 'Completed'})
+    assert backend.version(username) != version
+    assert [g['status'] for g in backend.load(username, 'goals')] == ['Completed']
+    assert inner.load(username, 'goals') == []
+
+    backend.flush(username)
+    assert [g['status'] for g in inner.load(username, 'goals')] == ['Completed']
+    assert [g['status'] for g in backend.load(username, 'goals')] == ['Completed']
+
+
+class FlakyBackend(FileBackend):
+    """Fails every update until ``failing`` is cleared."""
+
+    failing = True
+
+    def update_entry(self, username, data_type, entry_id, changes):
+        if self.failing:
+            raise OSError("disk full")
+        super().update_entry(username, data_type, entry_id, changes)
+
+
+def test_failed_write_behind_flush_is_retried(username):
+    inner = FlakyBackend()
+    backend = WriteBehindBackend(inner, mode="batched", interval=3600)
+    backend.add_entry(username, 'goals', goal("a", id="a", timestamp="2024-01-01 10:00:00"))
+    backend.update_entry(username, 'goals', "a", {'status': 'Completed'})
+
+    with pytest.raises(OSError):
+        backend.flush(username)
+    # The add reached the backend; the update is still queued and visible.
+    assert [g['status'] for g in inner.load(username, 'goals')] == ['In Progress']
+    assert [g['status'] for g in backend.load(username, 'goals')] == ['Completed']
+
+    inner.failing = False
+    backend.flush(username)
+    assert [g['status'] for g in inner.load(username, 'goals')] == ['Completed']
+    assert [g['goal'] for g in inner.load(username, 'goals')] == ["a"]